@@ -1,49 +1,60 @@
 import os
-import h5py
+import sys
 import numpy as np
+# Scripts are also run directly, which puts only this directory on the path.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from engine.game_database import GameDatabase
 
 
-def parse_logs(root_dir, game_to_check):
+def parse_logs(database_path, game_to_check):
+    """
+    Win rates of every heuristic against the others, from the games of a database.
+    :param database_path: Game database file.
+    :param game_to_check: List of heuristic names. Games involving other heuristics are ignored.
+    :return:
+    (heuristics, heuristics, 4) array. Entry [i, j] holds the wins of heuristic i against j, the number of them by a
+    line and by an enclosure, and the draws between both.
+    """
     idx_dict = {game: idx for idx, game in enumerate(game_to_check)}
     wins = np.zeros((len(game_to_check), len(game_to_check), 4))
-    total_draws = []
-    for game in game_to_check:
-        draws = 0
-        log_list = os.listdir(os.path.join(root_dir, game))
-        idx1 = idx_dict[game]
-        for log in log_list:
-            if '.h5' in os.path.splitext(log):
-                with h5py.File(os.path.join(root_dir, game, log), 'r') as h5_game_result:
-                    game_result = h5_game_result[[*h5_game_result.keys()][0]]
-                    player_won, colinear, surround = game_result['win'][()]
-                    other_heuristic = game_result['p2']['heuristic'][()]
-                    idx2 = idx_dict[other_heuristic]
-                    time = game_result['time'][()]
-                    if player_won == 1:
-                        wins[idx1, idx2, 0] += 1
-                        wins[idx1, idx2, 1] += colinear
-                        wins[idx1, idx2, 2] += surround
-                    elif player_won == 2:
-                        wins[idx2, idx1, 0] += 0
-                        wins[idx2, idx1, 1] += 0
-                        wins[idx2, idx1, 2] += 0
-                    else:
-                        wins[idx1, idx2, 3] += 1
-                        # wins[idx2, idx1, 3] += 1
-                        draws += 1
-        total_draws.append(draws)
+    games = np.zeros(len(game_to_check))
+    with GameDatabase(database_path, 'r') as database:
+        for game_result in database.games():
+            heuristic1, heuristic2 = game_result['heuristics']
+            if heuristic1 not in idx_dict or heuristic2 not in idx_dict:
+                continue
+            idx1 = idx_dict[heuristic1]
+            idx2 = idx_dict[heuristic2]
+            player_won = game_result['winner']
+            colinear = game_result['colinear']
+            surround = game_result['surrounded']
+            if idx1 == idx2:
+                # Self-play says nothing about the relative strength.
+                continue
+            games[idx1] += 1
+            games[idx2] += 1
+            if player_won in (1, 2):
+                winner, loser = (idx1, idx2) if player_won == 1 else (idx2, idx1)
+                wins[winner, loser, 0] += 1
+                wins[winner, loser, 1] += colinear
+                wins[winner, loser, 2] += surround
+            else:
+                wins[idx1, idx2, 3] += 1
+                wins[idx2, idx1, 3] += 1
 
-    excluder = (np.ones(5) - np.eye(5))
-    winrate = np.sum(wins[:, :, 0] * excluder, axis=1) / 20
-    colinear_wins = np.sum(wins[:, :, 1] * excluder, axis=1) / 20
-    surrounded_wins = np.sum(wins[:, :, 2] * excluder, axis=1) / 20
+    # Rates over every game a heuristic played, with either color.
+    games = np.maximum(games, 1)
+    winrate = np.sum(wins[:, :, 0], axis=1) / games
+    colinear_wins = np.sum(wins[:, :, 1], axis=1) / games
+    surrounded_wins = np.sum(wins[:, :, 2], axis=1) / games
+    draws = np.sum(wins[:, :, 3], axis=1) / games
     for idx, game in enumerate(game_to_check):
-        print('Winrate of {}: {:.2f} Colinear: {:.2f} Surround {:.2f}'.format(game, winrate[idx],
-                                                                              colinear_wins[idx], surrounded_wins[idx]))
-
+        print('Winrate of {}: {:.2f} Colinear: {:.2f} Surround {:.2f} Draws {:.2f}'.format(
+            game, winrate[idx], colinear_wins[idx], surrounded_wins[idx], draws[idx]))
+    return wins
 
 
 if __name__ == '__main__':
-    log_path = 'D:\PycharmProjects\\andantino_logs'
-    game_to_check = ['dist_self_min', 'dist_other_max',  'dist_other_self_min', 'dist_other_self_max', 'dist_move_matrix']
-    parse_logs(log_path, game_to_check)
\ No newline at end of file
+    database_path = 'D:\\PycharmProjects\\andantino_logs\\games.h5'
+    game_to_check = ['dist_self_min', 'hex_heuristic', 'threat_heuristic']
+    parse_logs(database_path, game_to_check)
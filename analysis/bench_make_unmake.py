@@ -0,0 +1,48 @@
+import os
+import random
+import sys
+from time import perf_counter
+# Scripts are also run directly, which puts only this directory on the path.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from engine.game_engine import GameEngine
+from engine.geometry import board_geometry
+
+
+def bench_make_unmake(engine, num_positions=50, num_stones=20, repeats=200, seed=0):
+    """
+    Time the make/unmake pair the search runs for every child: '_set_temporary_owner' with a player and then with -1.
+    Every registered hook (threat table, incremental evaluator) is included in the measure.
+    :param engine: GameEngine object. Its board is cleared and reused.
+    :param num_positions: Number of random positions measured.
+    :param num_stones: Number of stones of every position.
+    :param repeats: Make/unmake pairs per legal move of a position.
+    :param seed: Seed of the random positions.
+    :return:
+    Mean time of a make/unmake pair in microseconds.
+    """
+    rng = random.Random(seed)
+    cells = engine.board.cells
+    elapsed = 0.
+    pairs = 0
+    for _ in range(num_positions):
+        for player in (1, 2):
+            for idx in engine.board.stones(player):
+                engine.set_owner(cells[idx], -1)
+        for stone in range(num_stones):
+            engine.set_owner(cells[rng.choice(engine.move_gen.moves())], 1 + stone % 2)
+
+        side = 1 + num_stones % 2
+        moves = [cells[idx] for idx in engine.move_gen.moves()]
+        start = perf_counter()
+        for _ in range(repeats):
+            for move in moves:
+                engine._set_temporary_owner(move, side)
+                engine._set_temporary_owner(move, -1)
+        elapsed += perf_counter() - start
+        pairs += repeats * len(moves)
+    return 1e6 * elapsed / pairs
+
+
+if __name__ == '__main__':
+    mean = bench_make_unmake(GameEngine(None, None, geometry=board_geometry(10)))
+    print('Make/unmake: {:.2f} us per move'.format(mean))
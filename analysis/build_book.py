@@ -0,0 +1,25 @@
+import os
+import sys
+# Scripts are also run directly, which puts only this directory on the path.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from engine.book import build_book
+from engine.game_database import GameDatabase
+from engine.geometry import board_geometry
+
+
+def read_games(database_path):
+    """
+    Read the finished games of a game database. Games stored without moves are skipped.
+    :param database_path: Game database file.
+    :return:
+    List of tuples (moves, winner). Moves are cells (x,y) in play order, winner 1, 2 or 0 for draws.
+    """
+    with GameDatabase(database_path, 'r') as database:
+        return [(game['moves'], game['winner']) for game in database.games() if game['moves']]
+
+
+if __name__ == '__main__':
+    log_path = 'D:\\PycharmProjects\\andantino_logs'
+    book_path = os.path.join(log_path, 'book.npy')
+    num_entries = build_book(read_games(os.path.join(log_path, 'games.h5')), board_geometry(10), book_path)
+    print('Book with {} entries written to {}'.format(num_entries, book_path))
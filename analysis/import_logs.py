@@ -0,0 +1,11 @@
+import os
+import sys
+# Scripts are also run directly, which puts only this directory on the path.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from engine.game_database import GameDatabase, import_logs
+
+if __name__ == '__main__':
+    log_path = 'D:\\PycharmProjects\\andantino_logs'
+    with GameDatabase(os.path.join(log_path, 'games.h5')) as database:
+        num_games = import_logs(log_path, database)
+        print('{} games imported, {} in the database'.format(num_games, len(database)))
@@ -0,0 +1,158 @@
+import argparse
+import os
+import random
+import sys
+import traceback
+from itertools import permutations
+from multiprocessing.pool import Pool
+from time import time
+# Scripts are also run directly, which puts only this directory on the path.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from engine.game_database import DatabaseWriter, GameDatabase
+from engine.game_engine import GameEngine
+from engine.heuristic import heuristic_types
+
+# Draw after this many stones, as in 'GameInstance'.
+_MAX_STONES = 50
+# Random moves played at the start of every game, so repeated games of a pairing differ.
+_RANDOM_PLIES = 2
+# Heuristics played when none are given. The distance heuristics 'dist_other_max' and 'dist_move_matrix' don't return
+# a usable score on every position and can't be searched.
+_HEURISTICS = ('dist_self_min', 'hex_heuristic', 'threat_heuristic')
+
+# Per worker process state. Set by '_init_worker'.
+_worker_engine = None
+_worker_writer = None
+
+
+def _init_worker(time_move, writer):
+    """
+    Worker process initializer. Every worker keeps one engine for all the games it plays.
+    :param time_move: Search time per move in seconds.
+    :param writer: DatabaseWriter finished games are sent to.
+    :return:
+    """
+    global _worker_engine, _worker_writer
+    # Pool workers are daemonic and can't start processes of their own. The pool already uses every CPU.
+    _worker_engine = GameEngine(None, None, time_move=time_move, search_mode='serial', mcts_workers=1)
+    _worker_writer = writer
+
+
+def _play_game(task):
+    """
+    Play a full ai vs. ai game in a worker and send it to the database writer. A game that raises is reported and not
+    stored, the worker goes on with the next one.
+    :param task: Tuple (heuristic1, heuristic2, search, seed, random_plies).
+    :return:
+    Tuple (heuristic1, heuristic2, winner, error). Winner is None and error the traceback if the game failed.
+    """
+    heuristic1, heuristic2, search, seed, random_plies = task
+    try:
+        result, end_time, details, players = _run_game(heuristic1, heuristic2, search, seed, random_plies)
+    except Exception:
+        return heuristic1, heuristic2, None, traceback.format_exc()
+    _worker_writer.append(result, end_time, details, players)
+    return heuristic1, heuristic2, result[0], None
+
+
+def _run_game(heuristic1, heuristic2, search, seed, random_plies):
+    """
+    Play a full ai vs. ai game on the worker engine.
+    :return:
+    Tuple (result, time, details, players) with the arguments of 'GameDatabase.append'.
+    """
+    engine = _worker_engine
+    engine.set_position([], [])
+    rng = random.Random(seed)
+    hexes = (set(), set())
+    moves = ([], [])
+    start = time()
+    details = (0, 0, 0, 0)
+    result = (0, -1, -1)
+    for ply in range(_MAX_STONES):
+        player = 1 + ply % 2
+        valid_moves = engine.check_valid_moves()
+        if not valid_moves:
+            break
+        if ply < random_plies:
+            cell = rng.choice(valid_moves)
+        else:
+            cell = engine.ai_move(hexes[0], hexes[1], heuristic1 if player == 1 else heuristic2, search)
+        engine.set_owner(cell, player)
+        hexes[player - 1].add(cell)
+        moves[player - 1].append(cell)
+        details = engine.check_win_after(cell, player, details=True)
+        if any(details):
+            surrounded1, colinear1, surrounded2, colinear2 = details
+            if surrounded1 or colinear1:
+                result = (1, surrounded1, colinear1)
+            else:
+                result = (2, surrounded2, colinear2)
+            break
+    return result, time() - start, details, ((heuristic1, moves[0]), (heuristic2, moves[1]))
+
+
+def round_robin(database_path, heuristics=None, games_per_pairing=10, time_move=1., search='alphabeta',
+                num_workers=None, random_plies=_RANDOM_PLIES):
+    """
+    Round-robin tournament between evaluation functions. Every ordered pair of heuristics plays, so each pairing is
+    played with both colors. Workers send every game to a single database writer as soon as it ends. Games already in
+    the database count towards their pairing, so an interrupted tournament resumes where it stopped.
+    :param database_path: Game database file. Created if missing.
+    :param heuristics: List of heuristic names. Defaults to every heuristic that can be searched.
+    :param games_per_pairing: Number of games of every ordered pair.
+    :param time_move: Search time per move in seconds.
+    :param search: 'alphabeta' or 'mcts'.
+    :param num_workers: Number of worker processes. Defaults to the number of CPUs.
+    :param random_plies: Random moves played at the start of every game.
+    :return:
+    Number of games played and stored. Failed games are reported and left for the next run.
+    """
+    if heuristics is None:
+        heuristics = _HEURISTICS
+    played = dict()
+    if os.path.exists(database_path):
+        with GameDatabase(database_path, 'r') as database:
+            for game in database.games():
+                played[game['heuristics']] = played.get(game['heuristics'], 0) + 1
+    tasks = []
+    for pairing in permutations(heuristics, 2):
+        # Seeds follow the games already played, so resumed tournaments don't replay the same openings.
+        for game in range(played.get(pairing, 0), games_per_pairing):
+            tasks.append((*pairing, search, game, random_plies))
+
+    stored = 0
+    writer = DatabaseWriter(database_path)
+    pool = Pool(num_workers, initializer=_init_worker, initargs=(time_move, writer))
+    try:
+        for done, (heuristic1, heuristic2, winner, error) in enumerate(pool.imap_unordered(_play_game, tasks)):
+            if error is not None:
+                outcome = 'failed\n' + error
+            elif winner == 0:
+                outcome = 'draw'
+            else:
+                outcome = 'player {} won'.format(winner)
+            stored += error is None
+            print('[{}/{}] {} vs. {}: {}'.format(done + 1, len(tasks), heuristic1, heuristic2, outcome))
+        # Let the workers exit on their own, so everything they queued reaches the writer.
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+        writer.close()
+    return stored
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Round-robin tournament between heuristics.')
+    parser.add_argument('database', help='Game database file the games are appended to.')
+    parser.add_argument('--heuristics', nargs='+', choices=heuristic_types(),
+                        help='Defaults to {}.'.format(', '.join(_HEURISTICS)))
+    parser.add_argument('--games', type=int, default=10, help='Games per pairing and color.')
+    parser.add_argument('--time', type=float, default=1., help='Search time per move in seconds.')
+    parser.add_argument('--search', choices=('alphabeta', 'mcts'), default='alphabeta')
+    parser.add_argument('--workers', type=int, default=None, help='Defaults to the number of CPUs.')
+    args = parser.parse_args()
+    round_robin(args.database, args.heuristics, args.games, args.time, args.search, args.workers)
@@ -1,5 +1,3 @@
-import pygame
-
 # Configuration file. Modify it to change the program's behavior like player order, evaluation function, etc.
 # Be aware hex starting positions are hard-coded so the 'hexes' parameter SHOULD NOT be changed.
 window_config = {
@@ -9,14 +7,54 @@ window_config = {
 }
 
 player_config = {
+    # RGBA tuples, so the configuration loads without pygame.
     'color_dict': {
-    '1': pygame.Color('red'),
-    '2': pygame.Color('blue')},
+    '1': (255, 0, 0, 255),
+    '2': (0, 0, 255, 255)},
     'types': ('human', 'ai'),
-    'heuristic': ('hex_heuristic', 'hex_heuristic')
+    'heuristic': ('hex_heuristic', 'hex_heuristic'),
+    # Search algorithm of ai players: 'alphabeta' or 'mcts'. MCTS ignores the heuristic.
+    'search': ('alphabeta', 'alphabeta')
+}
+
+engine_config = {
+    # Memory budget of the transposition table in megabytes.
+    'tt_size_mb': 64,
+    # Store positions in the transposition table under their canonical key, so the 12 symmetric copies of a position
+    # share one entry.
+    'canonical_tt': True,
+    # Move ordering used by the search: 'killer_history' or 'random'.
+    'move_ordering': 'killer_history',
+    # Half width of the aspiration window used by iterative deepening. Same scale as the evaluation function.
+    'aspiration_window': 50,
+    # 'serial', 'root_split' (root moves searched in parallel by a pool of processes) or 'lazy_smp' (every process
+    # searches the whole tree, sharing a transposition table in shared memory).
+    'search_mode': 'serial',
+    # Number of worker processes of the parallel search. None uses every CPU.
+    'search_workers': None,
+    # Score the children of frontier nodes with one call to the batched heuristic, when the heuristic has one. Only
+    # applies to heuristics not evaluated incrementally: incremental evaluation is cheaper and takes precedence, so
+    # this needs 'incremental_eval' off (or a heuristic without an incremental version) to have any effect.
+    'batch_leaves': False,
+    # Update the evaluation on every move instead of scoring each leaf from scratch, when the heuristic allows it.
+    'incremental_eval': True,
+    # Compare every incremental evaluation against the full one. Raises ValueError on mismatch. Slow, for debugging.
+    'check_incremental': False,
+    # Share of the move time given to the forced win solver before the main search. 0 disables it.
+    'solver_time': 0.1,
+    # Maximum number of forcing moves the solver plays for the attacker.
+    'solver_depth': 8,
+    # Opening book (.npy file written by analysis/build_book.py) played before searching. None disables it.
+    'book_path': None,
+    # UCT exploration constant of the Monte Carlo tree search.
+    'mcts_exploration': 1.4,
+    # Number of independent MCTS trees grown in parallel processes (root parallelization). 1 searches in process.
+    'mcts_workers': 1,
 }
 
 save_config = {
     'root_dir': "D:\\PycharmProjects\\andantino_logs",
+    # Game database every finished game is appended to.
+    'database': 'D:\\PycharmProjects\\andantino_logs\\games.h5',
     'load_from': 'D:\\PycharmProjects\\andantino_logs\\1580046226.547153.pkl'
 }
@@ -0,0 +1,236 @@
+import numpy as np
+from engine.geometry import _DIRECTIONS, _AXES, _LENGTH_WIN
+
+
+def iter_bits(mask):
+    """
+    Iterate over the indices of the set bits of an integer bitmask, lowest first.
+    :param mask: Integer bitmask.
+    :return:
+    Generator of bit indices.
+    """
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def popcount(mask):
+    """
+    Number of set bits of an integer bitmask.
+    :param mask: Integer bitmask.
+    :return:
+    Integer count.
+    """
+    return bin(mask).count('1')
+
+
+class Board:
+    def __init__(self, geometry):
+        """
+        Compact board representation. Every visible hex gets a fixed index and each player's stones are kept as an
+        integer bitmask over those indices. Neighbour lists, neighbour masks and rays are read once from the static
+        geometry tables.
+        :param geometry: Geometry object of the playable cells.
+        """
+        self.geometry = geometry
+        self.cells = [(x, y) for x, y in geometry.cells.tolist()]
+        self.index = geometry.index
+        self.num_cells = geometry.num_cells
+        self.full_mask = (1 << self.num_cells) - 1
+
+        table = geometry.neighbors.tolist()
+        # Neighbours in ring order, -1 outside the board.
+        self.rings = table
+        self.neighbors = []
+        self.neighbor_masks = []
+        for row in table:
+            neigh = [n for n in row if n >= 0]
+            mask = 0
+            for n in neigh:
+                mask |= 1 << n
+            self.neighbors.append(neigh)
+            self.neighbor_masks.append(mask)
+
+        # Per cell and axis, the cells met walking forward and backward until the edge of the board.
+        directions = [(_DIRECTIONS.index((dx, dy)), _DIRECTIONS.index((-dx, -dy))) for dx, dy in _AXES]
+
+        def _walk(idx, direction):
+            ray = []
+            idx = table[idx][direction]
+            while idx >= 0:
+                ray.append(idx)
+                idx = table[idx][direction]
+            return ray
+
+        self.rays = [[(_walk(idx, forward), _walk(idx, backward)) for forward, backward in directions]
+                     for idx in range(self.num_cells)]
+
+        # Indexed by owner (1 or 2). Entry 0 is unused so owner values can be used directly.
+        self.bits = [0, 0, 0]
+        # Owner per cell. -1 for empty cells, as in the rest of the engine.
+        self.owners = [-1] * self.num_cells
+        # Longest run of stones per owner and axis. Updated on every placement and restored on removal.
+        self.longest = [[0] * len(_AXES) for _ in range(3)]
+        self._line_history = []
+        self._adjacency = None
+
+    def to_dict(self):
+        """
+        When called returns a dictionary with all the information required to load the board state.
+        :return:
+        Dictionary containing class relevant data.
+        """
+        board_dict = dict()
+        board_dict['cells'] = self.cells
+        board_dict['bits'] = list(self.bits)
+        return board_dict
+
+    @property
+    def occupied(self):
+        """
+        :return:
+        Bitmask of all cells holding a stone.
+        """
+        return self.bits[1] | self.bits[2]
+
+    @property
+    def adjacency(self):
+        """
+        Built on first use.
+        :return:
+        Symmetric (cells, cells) float NumPy array. 1 for neighbouring cells, 0 otherwise.
+        """
+        if self._adjacency is None:
+            adjacency = np.zeros((self.num_cells, self.num_cells))
+            for idx, neigh in enumerate(self.neighbors):
+                adjacency[idx, neigh] = 1
+            self._adjacency = adjacency
+        return self._adjacency
+
+    @property
+    def distances(self):
+        """
+        All pairs step distances, from the static geometry tables. Stones do not block the paths.
+        :return:
+        (cells, cells) int16 NumPy array. -1 for cells that are not connected.
+        """
+        return self.geometry.distances
+
+    def occupancy(self):
+        """
+        :return:
+        NumPy int8 array with the owner of every cell. -1 for empty cells.
+        """
+        return np.array(self.owners, dtype=np.int8)
+
+    def owner(self, idx):
+        """
+        :param idx: Cell index.
+        :return:
+        Owner of the cell. -1 if empty.
+        """
+        return self.owners[idx]
+
+    def place(self, idx, player):
+        """
+        Put a stone of 'player' on a cell. No validity checks are done.
+        :param idx: Cell index.
+        :param player: Player identifier (1 or 2).
+        :return:
+        """
+        self.owners[idx] = player
+        self.bits[player] |= 1 << idx
+        # Only the lines through the new stone can grow.
+        longest = self.longest[player]
+        self._line_history.append((idx, list(longest)))
+        for axis, run in enumerate(self.runs(idx, player)):
+            if run > longest[axis]:
+                longest[axis] = run
+
+    def remove(self, idx):
+        """
+        Remove the stone on a cell. No validity checks are done.
+        :param idx: Cell index.
+        :return:
+        """
+        player = self.owners[idx]
+        if player != -1:
+            self.bits[player] &= ~(1 << idx)
+            self.owners[idx] = -1
+            if self._line_history and self._line_history[-1][0] == idx:
+                self.longest[player] = self._line_history.pop()[1]
+            else:
+                # Stone removed out of order. Stored runs can't be trusted anymore.
+                self._line_history = []
+                self._recompute_longest()
+
+    def _recompute_longest(self):
+        """
+        Full recomputation of the longest runs of both players.
+        :return:
+        """
+        for player in (1, 2):
+            longest = [0] * len(_AXES)
+            for idx in iter_bits(self.bits[player]):
+                for axis, run in enumerate(self.runs(idx, player)):
+                    if run > longest[axis]:
+                        longest[axis] = run
+            self.longest[player] = longest
+
+    def runs(self, idx, player):
+        """
+        Length of the uninterrupted lines of 'player' stones through a cell, one per axis.
+        :param idx: Cell index.
+        :param player: Player identifier (1 or 2).
+        :return:
+        List with one run length per axis.
+        """
+        owners = self.owners
+        runs = []
+        for forward, backward in self.rays[idx]:
+            run = 1
+            for n in forward:
+                if owners[n] != player:
+                    break
+                run += 1
+            for n in backward:
+                if owners[n] != player:
+                    break
+                run += 1
+            runs.append(run)
+        return runs
+
+    def is_five(self, idx, player):
+        """
+        Win check keyed on the last move. Only the three lines through 'idx' are inspected.
+        :param idx: Cell index of the stone just placed.
+        :param player: Player identifier (1 or 2).
+        :return:
+        True if 'player' has a line of at least 5 stones through 'idx'.
+        """
+        return max(self.runs(idx, player)) >= _LENGTH_WIN
+
+    def has_five(self, player):
+        """
+        :param player: Player identifier (1 or 2).
+        :return:
+        True if 'player' has an uninterrupted line of at least 5 stones anywhere on the board.
+        """
+        return max(self.longest[player]) >= _LENGTH_WIN
+
+    def stones(self, player):
+        """
+        :param player: Player identifier (1 or 2).
+        :return:
+        List of cell indices owned by 'player'.
+        """
+        return list(iter_bits(self.bits[player]))
+
+    def count(self, player):
+        """
+        :param player: Player identifier (1 or 2).
+        :return:
+        Number of stones owned by 'player'.
+        """
+        return popcount(self.bits[player])
@@ -0,0 +1,85 @@
+import numpy as np
+from engine.board import Board
+from engine.zobrist import ZobristHash
+
+# Book entries. Stored sorted by key, several entries per key when more than one move was played.
+_DTYPE = np.dtype([('key', '<u8'), ('move', '<u2'), ('weight', '<u4')])
+# Only the first moves of each game go into the book.
+_BOOK_PLIES = 12
+# Weight of a move by the result of the game for the player that made it.
+_WIN_WEIGHT = 2
+_DRAW_WEIGHT = 1
+
+
+class OpeningBook:
+    def __init__(self, path):
+        """
+        Opening book stored as a sorted array of (canonical key, move, weight) entries. The file is memory-mapped so
+        only the pages touched by lookups are read.
+        :param path: Path of the .npy file written by 'build_book'.
+        """
+        self.entries = np.load(path, mmap_mode='r')
+        if self.entries.dtype != _DTYPE:
+            raise ValueError('Not an opening book file.')
+        self.keys = self.entries['key']
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, zhash):
+        """
+        Best book move for a position.
+        :param zhash: ZobristHash object kept up to date with the board.
+        :return:
+        Cell index of the heaviest book move, in the frame of the board. None if the position is not in the book.
+        """
+        key, sym = zhash.canonical_key()
+        key = np.uint64(key)
+        first = int(np.searchsorted(self.keys, key, side='left'))
+        last = int(np.searchsorted(self.keys, key, side='right'))
+        if first == last:
+            return None
+        best = first + int(np.argmax(self.entries['weight'][first:last]))
+        return zhash.inverses[sym][int(self.entries['move'][best])]
+
+
+def build_book(games, geometry, path, max_plies=_BOOK_PLIES):
+    """
+    Build an opening book from finished games. Positions are stored by canonical key, so games that only differ by a
+    symmetry of the board add up to the same entries.
+    :param games: Iterable of tuples (moves, winner). Moves is the list of played cells (x,y) in order, player 1
+                  first. Winner is 1, 2 or 0 for draws.
+    :param geometry: Geometry object of the board the games were played on.
+    :param path: Output .npy file path.
+    :param max_plies: Number of moves of every game to store.
+    :return:
+    Number of entries of the book.
+    """
+    board = Board(geometry)
+    zhash = ZobristHash(board)
+    weights = dict()
+    for moves, winner in games:
+        for player in (1, 2):
+            for idx in board.stones(player):
+                board.remove(idx)
+        zhash.reset(board)
+        for ply, cell in enumerate(moves[:max_plies]):
+            player = 1 + ply % 2
+            idx = geometry.index[tuple(cell)]
+            if winner == player:
+                weight = _WIN_WEIGHT
+            elif winner == 0:
+                weight = _DRAW_WEIGHT
+            else:
+                weight = 0
+            if weight:
+                key, sym = zhash.canonical_key()
+                entry = (key, zhash.symmetries[sym][idx])
+                weights[entry] = weights.get(entry, 0) + weight
+            board.place(idx, player)
+            zhash.update(player, idx)
+
+    entries = np.array([(key, move, weight) for (key, move), weight in weights.items()], dtype=_DTYPE)
+    entries.sort(order=('key', 'move'))
+    np.save(path, entries)
+    return len(entries)
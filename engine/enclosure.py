@@ -0,0 +1,59 @@
+from engine.board import iter_bits
+
+
+def flood_fill(board, seed, allowed):
+    """
+    Breadth first flood fill over the board bitmasks.
+    :param board: Board object.
+    :param seed: Bitmask of the starting cells.
+    :param allowed: Bitmask of the cells the fill may enter.
+    :return:
+    Bitmask of every cell reachable from 'seed' through 'allowed' cells.
+    """
+    neighbor_masks = board.neighbor_masks
+    reached = seed & allowed
+    frontier = reached
+    while frontier:
+        grown = 0
+        for idx in iter_bits(frontier):
+            grown |= neighbor_masks[idx]
+        frontier = grown & allowed & ~reached
+        reached |= frontier
+    return reached
+
+
+def check_surrounded(board, player):
+    """
+    Enclosure check. The opponent's stones act as walls; a single flood fill starting from one of 'player''s stones
+    walks every empty or allied cell it can reach. If any of 'player''s stones is not reached, it has been cut off
+    from the rest by the opponent.
+    :param board: Board object.
+    :param player: Player identifier (1 or 2) whose stones may be surrounded.
+    :return:
+    Returns 1 if at least a piece is surrounded. 0 otherwise.
+    """
+    stones = board.bits[player]
+    if not stones:
+        return 0
+    opponent = 3 - player
+    seed = stones & -stones
+    reached = flood_fill(board, seed, board.full_mask & ~board.bits[opponent])
+    if stones & ~reached:
+        return 1
+    return 0
+
+
+def may_enclose(board, idx, player):
+    """
+    Cheap necessary condition for a new enclosure. If the open cells around a stone form a single arc, every path
+    through the stone can go around it and placing it disconnects nothing.
+    :param board: Board object.
+    :param idx: Cell index of the stone, placed or about to be.
+    :param player: Player identifier (1 or 2) owning the stone.
+    :return:
+    False if the stone can't surround anything.
+    """
+    owners = board.owners
+    walls = [n == -1 or owners[n] == player for n in board.rings[idx]]
+    changes = sum(walls[i] != walls[i - 1] for i in range(len(walls)))
+    return changes > 2
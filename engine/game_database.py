@@ -0,0 +1,169 @@
+import multiprocessing
+import os
+from itertools import chain, zip_longest
+import h5py
+import numpy as np
+
+# One row per finished game. Its moves are rows 'first_move' to 'first_move + num_moves' of the moves dataset, in play
+# order, player 1 first. Heuristics are empty for human players.
+_GAME_DTYPE = np.dtype([('winner', 'i1'), ('surrounded', 'i1'), ('colinear', 'i1'), ('time', 'f8'),
+                        ('heuristic1', 'S32'), ('heuristic2', 'S32'),
+                        ('surrounded1', 'i1'), ('colinear1', 'i1'), ('surrounded2', 'i1'), ('colinear2', 'i1'),
+                        ('first_move', 'i8'), ('num_moves', 'i2')])
+# Rows per chunk. Datasets grow a chunk at a time on disk, however many games are appended.
+_CHUNK_GAMES = 1024
+_CHUNK_MOVES = 16384
+
+
+class GameDatabase:
+    def __init__(self, path, mode='a'):
+        """
+        Every finished game in a single HDF5 file: a resizable table of game results and a resizable table of moves.
+        Games are appended and flushed one at a time, so a crash loses at most the game being written. HDF5 files
+        can't be written by several processes at once; use 'DatabaseWriter' for that.
+        :param path: File path. Created if missing in 'a' mode.
+        :param mode: 'a' to read and append, 'r' to read only.
+        """
+        self.file = h5py.File(path, mode)
+        if 'games' not in self.file:
+            if mode == 'r':
+                raise ValueError('Not a game database file.')
+            self.file.create_dataset('games', shape=(0,), maxshape=(None,), dtype=_GAME_DTYPE, chunks=(_CHUNK_GAMES,))
+            self.file.create_dataset('moves', shape=(0, 2), maxshape=(None, 2), dtype=np.int16,
+                                     chunks=(_CHUNK_MOVES, 2))
+        self.games_table = self.file['games']
+        self.moves_table = self.file['moves']
+
+    def __len__(self):
+        return len(self.games_table)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.file.close()
+
+    def append(self, result, end_time, details, players):
+        """
+        Store a finished game.
+        :param result: Tuple (winner, surrounded, colinear). Winner is 1, 2 or 0 for draws.
+        :param end_time: Duration of the game in seconds.
+        :param details: Tuple (surrounded1, colinear1, surrounded2, colinear2) as returned by 'check_for_game_end'.
+        :param players: Tuple (heuristic, move list) of each player. Heuristic is None for human players.
+        :return:
+        """
+        (heuristic1, moves1), (heuristic2, moves2) = players
+        moves = [move for move in chain.from_iterable(zip_longest(moves1, moves2)) if move is not None]
+        first_move = len(self.moves_table)
+        self.moves_table.resize((first_move + len(moves), 2))
+        if moves:
+            self.moves_table[first_move:] = np.array(moves, dtype=np.int16).reshape(-1, 2)
+
+        game = np.array([(*result, end_time, (heuristic1 or '').encode(), (heuristic2 or '').encode(), *details,
+                          first_move, len(moves))], dtype=_GAME_DTYPE)
+        num_games = len(self.games_table)
+        self.games_table.resize((num_games + 1,))
+        self.games_table[num_games:] = game
+        self.file.flush()
+
+    def games(self):
+        """
+        Read every stored game.
+        :return:
+        Generator of dictionaries with keys 'winner', 'surrounded', 'colinear', 'time', 'heuristics' (tuple, None for
+        humans), 'details' (tuple as in 'append') and 'moves' (list of cells (x,y) in play order).
+        """
+        games = self.games_table[()]
+        moves = self.moves_table[()].tolist()
+        for game in games:
+            first = int(game['first_move'])
+            yield {
+                'winner': int(game['winner']),
+                'surrounded': int(game['surrounded']),
+                'colinear': int(game['colinear']),
+                'time': float(game['time']),
+                'heuristics': tuple(game[name].decode() or None for name in ('heuristic1', 'heuristic2')),
+                'details': tuple(int(game[name]) for name in ('surrounded1', 'colinear1', 'surrounded2', 'colinear2')),
+                'moves': [tuple(move) for move in moves[first:first + int(game['num_moves'])]],
+            }
+
+
+def _writer_loop(path, queue):
+    """
+    Body of the writer process. Appends queued games until it receives None.
+    :param path: Database file path.
+    :param queue: multiprocessing.Queue of 'GameDatabase.append' argument tuples.
+    :return:
+    """
+    with GameDatabase(path) as database:
+        for game in iter(queue.get, None):
+            database.append(*game)
+
+
+class DatabaseWriter:
+    def __init__(self, path):
+        """
+        Single writer process of a game database. Any number of processes can queue games through 'append', also
+        from worker processes that received the queue.
+        :param path: Database file path. Must not be open anywhere else until 'close'.
+        """
+        self.queue = multiprocessing.Queue()
+        self.process = multiprocessing.Process(target=_writer_loop, args=(path, self.queue))
+        self.process.start()
+
+    def __getstate__(self):
+        # Worker processes given the writer only need the queue.
+        return {'queue': self.queue, 'process': None}
+
+    def append(self, result, end_time, details, players):
+        """
+        Same interface as 'GameDatabase.append'. Returns at once, the game is written by the writer process.
+        :return:
+        """
+        self.queue.put((result, end_time, details, players))
+
+    def close(self):
+        """
+        Write the queued games and stop the writer process.
+        :return:
+        """
+        self.queue.put(None)
+        self.process.join()
+
+
+def import_logs(root_dir, database):
+    """
+    Append the games of the per game .h5 logs written by older versions to a database.
+    :param root_dir: Directory searched recursively for .h5 logs.
+    :param database: GameDatabase object.
+    :return:
+    Number of games imported.
+    """
+    imported = 0
+    for dirpath, _, files in os.walk(root_dir):
+        for log in files:
+            path = os.path.join(dirpath, log)
+            # The database may live in the same directory.
+            if os.path.splitext(log)[1] != '.h5' or os.path.abspath(path) == os.path.abspath(database.file.filename):
+                continue
+            with h5py.File(path, 'r') as h5_game_result:
+                for game_result in h5_game_result.values():
+                    if 'win' not in game_result:
+                        continue
+                    players = []
+                    details = []
+                    for name in ('p1', 'p2'):
+                        player_log = game_result[name]
+                        heuristic = player_log['heuristic'][()] if 'heuristic' in player_log else None
+                        if isinstance(heuristic, bytes):
+                            heuristic = heuristic.decode()
+                        # Logs written before move lists were stored have none.
+                        moves = player_log['moves'][()].tolist() if 'moves' in player_log else []
+                        players.append((heuristic, [tuple(move) for move in moves]))
+                        details.extend((int(player_log['surrounded'][()]), int(player_log['colinear'][()])))
+                    database.append(game_result['win'][()].tolist(), float(game_result['time'][()]), details, players)
+                    imported += 1
+    return imported
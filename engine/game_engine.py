@@ -1,60 +1,96 @@
-from itertools import repeat
-import networkx as nx
 import numpy as np
-import copy
-from engine. mp_engine import check_surrounded_mp
-from collections import Counter
-from multiprocessing.pool import Pool
+from engine.enclosure import check_surrounded, may_enclose
+from engine.board import Board
+from engine.geometry import board_geometry
+from engine.move_generator import MoveGenerator
+from engine.threats import ThreatTable
 from multiprocessing import Process
-from engine.heuristic import heuristic_eval
+from engine.heuristic import heuristic_eval, heuristic_batch_eval, heuristic_incremental
 from time import time
 from engine.zobrist import ZobristHash
+from engine.transposition import TranspositionTable, EXACT, LOWER, UPPER
+from engine.move_ordering import move_orderer
+from engine.parallel import RootSplitSearch, LazySMPSearch
+from engine.mcts import MCTS, RootParallelMCTS, best_move
+from engine.solver import ThreatSpaceSolver, WIN, UNKNOWN
+from engine.book import OpeningBook
+from configs import engine_config, window_config
 
 # Hardcoded Reward value and max time per iterative deepening level.
 _REWARD = 1e7
 _MAX_TIME = 10 * 60 # 10 minutes max * 60 s / m
 _MAX_MOVES = 25 # In Andantino up to 25 stones may be played
 _TIME_MOVE = _MAX_TIME / _MAX_MOVES
+# First stone must be played here. Hardcoded for the current board size.
+_CENTER = (16, 9)
 
 
 
 class GameEngine:
-    def __init__(self, board, first_player):
-
-        def _visible(cell):
-            """
-            Checks if hexes are visible to avoid having an invalid representation of the board. Visibility is determined
-            by hex's alpha channel value (transparency).
-            :param cell: Tuple (x,y).
-            :return:
-            True if visible false otherwise.
-            """
-            if board.map.fog[cell][3] == 0:
-                return True
-            return False
-
-        self.first_type = first_player.type
-
-        visible_cells = [cell for cell in board.map.fog if _visible(cell)]
-
-        self.graph = nx.Graph()
-        self.graph.add_nodes_from(visible_cells)
-        for node in self.graph.nodes:
-            self.graph.nodes[node]['owner'] = -1
-            neigh = [cell for cell in board.map.spread(node, radius=1) if _visible(cell)]
-            self.graph.add_edges_from(zip(repeat(node, len(neigh)), neigh))
-        nx.set_edge_attributes(self.graph, {e: 1 for e in self.graph.edges()}, 'cost')
-        aux = np.array([np.array(n) for n in self.graph.nodes])
+    def __init__(self, board, first_player, geometry=None, time_move=None, search_mode=None, mcts_workers=None):
+        """
+        :param board: GameWindow object. Unused, the playable cells come from the static board geometry.
+        :param first_player: Player object of the first player.
+        :param geometry: Geometry object of the playable cells. Defaults to the standard board. When given, 'board' and
+                         'first_player' may be None. Used by search worker processes, which have no window.
+        :param time_move: Time per move in seconds. Defaults to the game time spread over the moves of a game.
+        :param search_mode: 'serial', 'lazy_smp' or 'root_split'. Defaults to engine_config['search_mode'].
+        :param mcts_workers: Processes of the Monte Carlo search. Defaults to engine_config['mcts_workers'].
+        """
+        self.first_type = first_player.type if first_player is not None else 'ai'
+        if geometry is None:
+            geometry = board_geometry(window_config['hexes'])
+        self.geometry = geometry
+        self.time_move = _TIME_MOVE if time_move is None else time_move
+        self.search_mode = engine_config['search_mode'] if search_mode is None else search_mode
+        self.mcts_workers = engine_config['mcts_workers'] if mcts_workers is None else mcts_workers
+
+        # Compact board core. Ownership and topology live here.
+        self.board = Board(geometry)
+        self.move_gen = MoveGenerator(self.board, self.board.index[_CENTER])
+        aux = np.array(self.board.cells)
         self.min_x = np.min(aux[:, 0])
         self.max_x = np.max(aux[:, 0])
         self.min_y = np.min(aux[:, 1])
         self.max_y = np.max(aux[:, 1])
-        self.process_pool = Pool(4)
 
         # Transposition table
-        self.zhash = ZobristHash(self.graph)
-        self.transposition_table = dict()
+        self.zhash = ZobristHash(self.board)
+        self.transposition_table = TranspositionTable(engine_config['tt_size_mb'])
+        self.orderer = move_orderer(engine_config['move_ordering'], self.board.num_cells)
         self.max_depth = 2
+        # Set when the search runs out of time. Every node then returns immediately.
+        self.timed_out = False
+        # Search state, set by 'ai_move'.
+        self._heuristic_func = None
+        self._batch_func = None
+        # Objects notified of every stone placed ('place(idx, player)', after the change) or removed
+        # ('remove(idx, player)', before the change). See 'register_hook'.
+        self._hooks = []
+        # Incremental evaluator of the current heuristic, if it has one. Also registered as a hook.
+        self._incremental = None
+        # Line window counts. Exposes fours, threes and winning moves to the search.
+        self.threats = ThreatTable(self.board)
+        self.register_hook(self.threats)
+        # Forced win solver run before the main search.
+        self.solver = ThreatSpaceSolver(self, 2 * _MAX_MOVES)
+        self.last_solver = UNKNOWN
+        # Opening book consulted before any search.
+        self.book = OpeningBook(engine_config['book_path']) if engine_config['book_path'] else None
+        # Static scores of the children of the current frontier node, keyed by Zobrist key.
+        self._leaf_scores = dict()
+        self._root_player = 1
+        self._timer = (0, 0)
+        self._tt_owner = None
+        self._canonical_tt = False
+        # Statistics and principal variation of the last search.
+        self.stats = {'nodes': 0, 'cutoffs': 0, 're_searches': 0, 'tt_hits': 0, 'depth': 0}
+        self.last_pv = []
+        # Created on the first parallel search.
+        self.root_split = None
+        self.lazy_smp = None
+        # Created on the first Monte Carlo search. The tree is kept between moves.
+        self.mcts = None
 
     def to_dict(self):
         """
@@ -64,7 +100,7 @@ class GameEngine:
         Dictionary containing class relevant data.
         """
         engine_dict = dict()
-        engine_dict['graph'] = self.graph
+        engine_dict['board'] = self.board.to_dict()
         engine_dict['min_x'] = self.min_x
         engine_dict['max_x'] = self.max_x
         engine_dict['min_y'] = self.min_y
@@ -82,127 +118,186 @@ class GameEngine:
         self.min_y = engine_dict['min_y']
         self.max_y = engine_dict['max_y']
 
-    def _cost_func(self, node_u, node_v, player):
+    def _terminal_score(self, side, last_move=None):
         """
-        Simple piecewise definition of hex transition costs. Empty -> Allied, Allied -> Empty and Allied -> Allied have a
-        small associated cost.
-        :param node_u:
-        :param node_v:
-        :param player: Which player stones are allied and which are opposing.
+        Score of finished games from the point of view of the player to move.
+        :param side: Player to move (1 or 2).
+        :param last_move: Tuple (x,y) of the stone just played by the opponent. Only that stone is checked if given,
+                          the whole board otherwise.
         :return:
-        Scalar value.
-        """
-        weight_dict_p1 = {
-            (-1, -1): 1,
-            (-1, 1): 1e5,
-            (-1, 2): 1e6,
-            (1, -1): 1e5,
-            (1, 1): 1,
-            (1, 2): 1e6,
-            (2, -1): 1e6,
-            (2, 1): 1e6,
-            (2, 2): 1e6,
-        }
-        weight_dict_p2 = {
-            (-1, -1): 1,
-            (-1, 1): 1e6,
-            (-1, 2): 1e5,
-            (1, -1): 1e6,
-            (1, 1): 1e6,
-            (1, 2): 1e6,
-            (2, -1): 1e5,
-            (2, 1): 1e6,
-            (2, 2): 1,
-        }
-        u = self.graph.nodes[node_u]['owner']
-        v = self.graph.nodes[node_v]['owner']
-        if player == -1:
-            return 1
-        elif player == 1:
-            return weight_dict_p1[(u, v)]
+        +/- reward for won/lost games, 0 for draws. None if the game is still running.
+        """
+        if last_move is None:
+            game_result = self.check_for_game_end()
+        else:
+            game_result = self.check_win_after(last_move, 3 - side)
+        if game_result[2 - side]:
+            # The player that just moved won.
+            return -_REWARD
+        elif game_result[side - 1]:
+            return _REWARD
+        elif self.move_gen.num_stones >= 2 * _MAX_MOVES:
+            return 0
+        return None
+
+    def _evaluate(self, side):
+        """
+        Static evaluation. The heuristic always scores the position for the player the search was started for and is
+        negated when the opponent is to move.
+        :param side: Player to move (1 or 2).
+        :return:
+        Score from the point of view of the player to move.
+        """
+        if self._incremental is not None:
+            score = self._incremental.evaluate(self._root_player - 1)[0]
+            if engine_config['check_incremental']:
+                full = self._heuristic_func(self._root_player - 1, self.board, self.move_gen.moves())[0]
+                if abs(full - score) > 1e-6:
+                    raise ValueError('Incremental evaluation {} differs from full evaluation {}.'.format(score, full))
         else:
-            return weight_dict_p2[(u, v)]
+            score = self._heuristic_func(self._root_player - 1, self.board, self.move_gen.moves())[0]
+        return score if side == self._root_player else -score
 
-    def _minimax(self, cur_depth, hex_dict, is_max_turn, heuristic_func, timer, player, alpha=float('-inf'), beta=float('inf')):
+    def _evaluate_children(self, moves, side):
+        """
+        Static evaluation of every child of the current node in a single call to the batched heuristic. Scores are
+        left in 'self._leaf_scores' for the leaf nodes to pick up.
+        :param moves: List of cell indices.
+        :param side: Player to move (1 or 2).
+        :return:
         """
-        Performs minimax tree search.
-        :param cur_depth: Current search depth.
-        :param hex_dict: Dictionary containing two sets of occupied hexes. One per player.
-        :param is_max_turn: If it is the maximizer's turn.
-        :param heuristic_func: What evaluation function to use.
-        :param timer: Sets a time limit for the search.
-        :param player: Player identifier. Either 0 or 1.
+        occupancy = np.repeat(self.board.occupancy()[np.newaxis], len(moves), axis=0)
+        occupancy[np.arange(len(moves)), moves] = side
+        scores = self._batch_func(self._root_player - 1, self.board, occupancy)
+        # Children have the opponent to move.
+        if 3 - side != self._root_player:
+            scores = -scores
+        table = self.zhash.table[side]
+        key = self.zhash.key ^ self.zhash.side
+        self._leaf_scores = {key ^ table[move]: float(score) for move, score in zip(moves, scores)}
+
+    def _negamax(self, depth, alpha=float('-inf'), beta=float('inf'), pv_move=None, last_move=None):
+        """
+        Negamax search with Principal Variation Search. The first child is searched with the full window and the rest
+        with a null window, searching again with the full window when a child turns out better than expected.
+        :param depth: Remaining search depth.
         :param alpha: Parameter alpha-beta pruning.
         :param beta: Parameter alpha-beta pruning.
+        :param pv_move: Move to search first when the transposition table has none. Cell index.
+        :param last_move: Tuple (x,y) of the move leading to this node. None at the root.
         :return:
-        Returns the value of the best move found and the move coordinates (x,y)
+        Returns the score from the point of view of the player to move and the principal variation as a list of cell
+        indices. Once the time limit is hit the search is abandoned, 'self.timed_out' is set and the returned value
+        must be ignored.
         """
-        best_value = float('-inf') if is_max_turn else float('inf')
-        best_move = None
-        valid_moves = self.check_valid_moves()
-        # Shuffle if not empty
-        try:
-            valid_moves = valid_moves[np.random.choice(range(len(valid_moves)), len(valid_moves), replace=False)]
-        except TypeError:
-            pass
-
         # Compare elapsed time vs max allowed time.
-        time_delta = time() - timer[0]
-        # If search limiters are met evaluate node.
-        if cur_depth <= 0 or time_delta >= timer[1]:
-            # Check for existence in the transposition table, otherwise compute.
-            hashkey = self.zhash.hash(self.graph)
-            try:
-                result, _, _ = self.transposition_table[hashkey]
-            except KeyError:
-                game_result = self.check_for_game_end(hex_dict[0], hex_dict[1])
-                hf = heuristic_func(player, self.graph, valid_moves)
-
-                if 1:
-                    if game_result[int(not player)]:
-                        result = _REWARD
-                        print(1, player, is_max_turn, result)
-                    elif game_result[int(player)]:
-                        result = -_REWARD
-                        print(2, player, is_max_turn, result)
-                    else:
-                        result = hf[0]
-
-                self.transposition_table[hashkey] = (result, None, cur_depth)
-            return result, None
-        # If search limiters are not met search the tree alternating between max and min.
+        if time() - self._timer[0] >= self._timer[1]:
+            self.timed_out = True
+            return 0, []
+        self.stats['nodes'] += 1
+
+        side = 1 + self.move_gen.num_stones % 2
+        score = self._terminal_score(side, last_move)
+        if score is not None:
+            return score, []
+
+        # Table entries of symmetric positions are shared. Moves are stored in the canonical frame.
+        if self._canonical_tt:
+            hashkey, sym = self.zhash.canonical_key()
         else:
-            for vm in valid_moves:
-                vm = tuple(vm)
-                # Simulate play. Done only on the board representation graph.
-                self._set_temporary_owner(vm, is_max_turn + 1)
-                hex_dict[is_max_turn].add(vm)
-
-                eval_child, move_child = self._minimax(cur_depth - 1, hex_dict, not is_max_turn, heuristic_func, timer, not player, alpha, beta)
-                # Undo play. Done only on the board representation graph.
-                self._set_temporary_owner(vm, -1)
-                hex_dict[is_max_turn].remove(vm)
-
-                # Alpha beta pruning
-                if is_max_turn and best_value < eval_child:
-                    best_value = eval_child
-                    best_move = vm
-                    alpha = max(alpha, best_value)
-                    if beta <= alpha:
-                        break
-
-                elif (not is_max_turn) and best_value > eval_child:
-                    best_value = eval_child
-                    best_move = vm
-                    beta = min(beta, best_value)
-                    if beta <= alpha:
-                        break
+            hashkey, sym = self.zhash.key, 0
+        alpha_orig = alpha
+        tt_move = pv_move
+        # Check for existence in the transposition table. Entries searched at least as deep can end the search or
+        # narrow the window, shallower ones still provide the best move to try first.
+        entry = self.transposition_table.probe(hashkey)
+        if entry is not None:
+            tt_value, tt_depth, tt_flag, stored_move = entry
+            if stored_move is not None and sym:
+                stored_move = self.zhash.inverses[sym][stored_move]
+            self.stats['tt_hits'] += 1
+            if tt_depth >= max(depth, 0):
+                pv = [stored_move] if stored_move is not None else []
+                if tt_flag == EXACT:
+                    return tt_value, pv
+                elif tt_flag == LOWER:
+                    alpha = max(alpha, tt_value)
+                elif tt_flag == UPPER:
+                    beta = min(beta, tt_value)
+                if beta <= alpha:
+                    return tt_value, pv
+            if stored_move is not None:
+                tt_move = stored_move
 
-                time_delta = time() - timer[0]
-                if time_delta >= timer[1]:
-                    break
+        # If search limiters are met evaluate node.
+        if depth <= 0:
+            # Batched scores are keyed by the plain key.
+            score = self._leaf_scores.get(self.zhash.key)
+            if score is None:
+                score = self._evaluate(side)
+            self.transposition_table.store(hashkey, 0, score, EXACT)
+            return score, []
+
+        valid_moves = self.move_gen.moves()
+        if not valid_moves:
+            return 0, []
+        valid_moves = self.orderer.order(self.board, valid_moves, side, tt_move)
+        # Lines of five are tried first: completing one, then blocking the opponent's. Order is kept otherwise.
+        wins = self.threats.winning_moves(side)
+        blocks = self.threats.winning_moves(3 - side)
+        if wins or blocks:
+            valid_moves = sorted(valid_moves, key=lambda m: (m not in wins, m not in blocks))
+        # Frontier node. Score all the leaves at once.
+        if depth == 1 and self._batch_func is not None:
+            self._evaluate_children(valid_moves, side)
+
+        best_value = float('-inf')
+        best_pv = []
+        completed = True
+        for i, move in enumerate(valid_moves):
+            cell = self.board.cells[move]
+            # Simulate play. Done only on the board representation.
+            self._set_temporary_owner(cell, side)
+            if i == 0:
+                score, child_pv = self._negamax(depth - 1, -beta, -alpha, last_move=cell)
+                score = -score
+            else:
+                score, child_pv = self._negamax(depth - 1, -alpha - 1, -alpha, last_move=cell)
+                score = -score
+                if alpha < score < beta and not self.timed_out:
+                    self.stats['re_searches'] += 1
+                    score, child_pv = self._negamax(depth - 1, -beta, -alpha, last_move=cell)
+                    score = -score
+            # Undo play. Done only on the board representation.
+            self._set_temporary_owner(cell, -1)
+
+            # The child was not fully searched, its value can't be used.
+            if self.timed_out:
+                completed = False
+                break
 
-            return best_value, best_move
+            if score > best_value:
+                best_value = score
+                best_pv = [move] + child_pv
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        self.stats['cutoffs'] += 1
+                        self.orderer.cutoff(self.board, move, side, depth)
+                        break
+        if depth == 1:
+            self._leaf_scores = dict()
+
+        # Results of an interrupted search are not trustworthy enough to be stored.
+        if completed:
+            if best_value <= alpha_orig:
+                flag = UPPER
+            elif best_value >= beta:
+                flag = LOWER
+            else:
+                flag = EXACT
+            self.transposition_table.store(hashkey, depth, best_value, flag, self.zhash.symmetries[sym][best_pv[0]])
+        return best_value, best_pv
 
     def check_valid_moves(self):
         """
@@ -210,202 +305,313 @@ class GameEngine:
         :return:
         List of valid moves.
         """
-        # Serves as move tree to search
-        occupied = [n for n in self.graph.nodes if self.graph.nodes[n]['owner'] is not -1]
-        if len(occupied) == 0:
-            # Fixed start for this board size
-            valid_moves = list(self.graph.neighbors((16, 9)))
-            valid_moves.append((16, 9))
-        elif len(occupied) == 1:
-            # Fixed start for this board size
-            if occupied[0] == (16, 9):
-                neigh = [m for n in occupied for m in list(self.graph.neighbors(n))]
-                neigh_counts = Counter(neigh)
-                # Remove already played hexes
-                for occ in occupied:
-                    neigh_counts[occ] = 0
-                valid_moves = np.array(list(neigh_counts.keys()))[np.array(list(neigh_counts.values())) > 0]
-            else:
-                valid_moves = [(16, 9)]
-        else:
-            neigh = [m for n in occupied for m in list(self.graph.neighbors(n))]
-            neigh_counts = Counter(neigh)
-            # Remove already played hexes
-            for occ in occupied:
-                neigh_counts[occ] = 0
-            valid_moves = np.array(list(neigh_counts.keys()))[np.array(list(neigh_counts.values())) > 1]
-            if len(valid_moves) == 0:
-                valid_moves = np.array(list(neigh_counts.keys()))[np.array(list(neigh_counts.values())) > 0]
-        return valid_moves
+        return [self.board.cells[idx] for idx in self.move_gen.moves()]
+
+    def _place(self, idx, player):
+        """
+        Put a stone on the board and update every incremental structure.
+        :param idx: Cell index.
+        :param player: Player identifier (1 or 2).
+        :return:
+        """
+        self.board.place(idx, player)
+        self.zhash.update(player, idx)
+        self.move_gen.place(idx)
+        for hook in self._hooks:
+            hook.place(idx, player)
+
+    def _remove(self, idx):
+        """
+        Remove a stone from the board and update every incremental structure. Empty cells are left untouched.
+        :param idx: Cell index.
+        :return:
+        """
+        owner = self.board.owners[idx]
+        if owner != -1:
+            for hook in self._hooks:
+                hook.remove(idx, owner)
+            self.zhash.update(owner, idx)
+            self.move_gen.remove(idx)
+            self.board.remove(idx)
+
+    def register_hook(self, hook):
+        """
+        Register an object to be notified of every stone placed or removed, in the search as well as in the game.
+        :param hook: Object with methods 'place(idx, player)', called after the stone is placed, and
+                     'remove(idx, player)', called before it is removed.
+        :return:
+        """
+        self._hooks.append(hook)
+
+    def unregister_hook(self, hook):
+        """
+        Stop notifying a hook added with 'register_hook'.
+        :param hook: Registered object.
+        :return:
+        """
+        self._hooks.remove(hook)
 
     def _set_temporary_owner(self, node, player):
         """
-        Helper function to simulate plays. Changes are only done on the representation graph.
+        Helper function to simulate plays. Changes are only done on the board representation.
         :param node: Tuple (x,y).
         :param player: Player identifier.
         :return:
         """
-        self.graph.nodes[node]['owner'] = int(player)
-        neighbors = list(self.graph.neighbors(node))
-        nx.set_edge_attributes(
-            self.graph,
-            {(node, neigh): self._cost_func(node, neigh, player) for neigh in neighbors},
-            name='cost'
-        )
+        player = int(player)
+        idx = self.board.index[node]
+        if player == -1:
+            self._remove(idx)
+        else:
+            self._place(idx, player)
 
     def set_owner(self, node, player):
         """
-        MAkes changes to the graph. Changes are initiated from the GameInstace object.
+        MAkes changes to the board. Changes are initiated from the GameInstace object.
         :param node: Tuple (x,y).
         :param player: Player identifier.
         :return:
         """
         # Separate board according to played pieces
         player = int(player)
+        idx = self.board.index[node]
         if player == -1:
-            self.graph.nodes[node]['owner'] = player
-            neighbors = list(self.graph.neighbors(node))
-            nx.set_edge_attributes(
-                self.graph,
-                {(node, neigh): self._cost_func(node, neigh, player) for neigh in neighbors},
-                name='cost')
-
-        elif self.graph.nodes[node]['owner'] == -1:
-            self.graph.nodes[node]['owner'] = player
-            neighbors = list(self.graph.neighbors(node))
-            nx.set_edge_attributes(
-                self.graph,
-                {(node, neigh): self._cost_func(node, neigh, player) for neigh in neighbors},
-                name='cost')
+            self._remove(idx)
+        elif self.board.owners[idx] == -1:
+            self._place(idx, player)
         else:
             raise AttributeError('Cell already owned.')
 
-    def _check_colinear(self, hexes, player, line_length=4, details=False):
+    def check_for_game_end(self, player1_hex=None, player2_hex=None, details=False):
         """
-        Colinearity check. Per occupied hex check lines of 5 spaces in the three possible directions.
-        :param hexes: Tuple (x,y).
-        :param player: Player identifier.
-        :return:
-        Returns True if an uninterrupted line of 5 stones is found.
-        """
-
-        def _make_lines2(x, y, x_min, x_max, y_min, y_max, length_win):
-            """
-            Generator for lines of length = length_win in 3 directions.
-            :param x: Hex x.
-            :param y: Hex y.
-            :param x_min: Smallest x value for the line.
-            :param x_max: Largest x value for the line.
-            :param y_min: Smallest y value for the line.
-            :param y_max: Largest y value for the line.
-            :param length_win: Length of the line necessary for a win
-            :return:
-            List of lists for the coordinates of the lines.
-            """
-            lines = [
-                list(zip(range(x_min, x_max), repeat(y, length_win))),
-                list(zip(range(x_min, x_max), range(y_min, y_max))),
-                list(zip(repeat(x, length_win), range(y_min, y_max)))
-            ]
-            return lines
-
-        # Hardcoded as per the game rules.
-        length_win = 5
-        for h in hexes:
-            x, y = h
-            # Move two spaces back on x and y.
-            x_min = int(x - (length_win - 1) / 2)
-            y_min = int(y - (length_win - 1) / 2)
-            # Move two spaces forward on x and y.
-            # Added one for non-inclusive end.
-            x_max = int(x + (length_win - 1) / 2) + 1
-            y_max = int(y + (length_win - 1) / 2) + 1
-            # Per hex check the lines to check.
-            lines = _make_lines2(x, y, x_min, x_max, y_min, y_max, length_win)
-            aux = []
-            aux_line = []
-            # Check how many of the hexes have to stones belonging to player.
-            for line in lines:
-                try:
-                    ownership = [self.graph.nodes[tuple(n)]['owner'] for n in line]
-                    l = [en for en, o in enumerate(ownership) if o == player]
-                    aux.append(sum(np.diff(sorted(l)) == 1))
-                    aux_line.append(line)
-                except KeyError:
-                    aux.append(0)
-            if np.max(aux) >= line_length:
-                if not details:
-                    return 1
-                else:
-                    return 1, aux_line[np.argmax(aux)]
-        if not details:
-            return 0
-        else:
-            return 0, aux_line[np.argmax(aux)]
-
-    def check_for_game_end(self, player1_hex, player2_hex, details=False):
-        """
-        Check whether one (or more) of the game conditions have been met.
-        :param player1_hex: Set of hexes owned by player 1.
-        :param player2_hex: Set of hexes owned by player 2.
+        Check whether one (or more) of the game conditions have been met. Game state is read from the board, which is
+        kept in sync with both sets.
+        :param player1_hex: Set of hexes owned by player 1. Unused, kept for callers.
+        :param player2_hex: Set of hexes owned by player 2. Unused, kept for callers.
         :param details: Return specific game end results. Used for logging.
         :return:
         Boolean of game end conditions.
         """
-        player1_hex = np.array(list(player1_hex))
-        player2_hex = np.array(list(player2_hex))
-
-        surrounded1 = check_surrounded_mp(self.graph, player2_hex, self.process_pool)
-        surrounded2 = check_surrounded_mp(self.graph, player1_hex, self.process_pool)
+        # Enclosures are read straight from the board bitmasks.
+        surrounded1 = check_surrounded(self.board, 2)
+        surrounded2 = check_surrounded(self.board, 1)
 
-        colinear1 = self._check_colinear(player1_hex, 1)
-        colinear2 = self._check_colinear(player2_hex, 2)
+        # Longest lines are kept up to date on every move.
+        colinear1 = int(self.board.has_five(1))
+        colinear2 = int(self.board.has_five(2))
         if details:
             return surrounded1, colinear1, surrounded2, colinear2
         else:
             return surrounded1 or colinear1, surrounded2 or colinear2
 
-    def ai_move(self, player1_hex, player2_hex, heuristic):
+    def check_win_after(self, move, player, details=False):
+        """
+        Same as 'check_for_game_end' for a position reached by 'player' putting a stone on 'move' in a running game.
+        Only the mover can have completed a line, and only through 'move'. Enclosures of the opponent are only looked
+        for when the stone splits the cells around it, and the mover can only have surrounded itself with a stone
+        that touches none of its own.
+        :param move: Tuple (x,y) of the stone just played.
+        :param player: Player identifier (1 or 2) of the mover.
+        :param details: Return specific game end results. Used for logging.
+        :return:
+        Boolean of game end conditions, in the same format as 'check_for_game_end'.
+        """
+        board = self.board
+        idx = board.index[move]
+        colinear = int(board.is_five(idx, player))
+        if details or not colinear:
+            surrounds = check_surrounded(board, 3 - player) if may_enclose(board, idx, player) else 0
+        else:
+            surrounds = 0
+        won = colinear or surrounds
+        if details or not won:
+            surrounded = 0 if board.neighbor_masks[idx] & board.bits[player] else check_surrounded(board, player)
+        else:
+            surrounded = 0
+        if details:
+            return (surrounds, colinear, surrounded, 0) if player == 1 else (surrounded, 0, surrounds, colinear)
+        else:
+            return (won, surrounded) if player == 1 else (surrounded, won)
+
+    def set_position(self, player1_hex, player2_hex):
+        """
+        Replace the position on the board. Used by search workers, which receive the stones instead of a board.
+        :param player1_hex: Iterable of hexes owned by player 1.
+        :param player2_hex: Iterable of hexes owned by player 2.
+        :return:
+        """
+        for player in (1, 2):
+            for idx in self.board.stones(player):
+                self._set_temporary_owner(self.board.cells[idx], -1)
+        for player, hexes in ((1, player1_hex), (2, player2_hex)):
+            for cell in hexes:
+                self._set_temporary_owner(tuple(cell), player)
+
+    def prepare_search(self, heuristic, root_player, timer):
+        """
+        Set the search state before a new search.
+        :param heuristic: Which evaluation function to use.
+        :param root_player: Player the search is run for (1 or 2).
+        :param timer: Tuple (start time, allowed time) in seconds.
+        :return:
+        """
+        self._heuristic_func = heuristic_eval(heuristic)
+        if self._incremental is not None:
+            self.unregister_hook(self._incremental)
+            self._incremental = None
+        incremental = heuristic_incremental(heuristic) if engine_config['incremental_eval'] else None
+        if incremental is not None:
+            self._incremental = incremental(self.board)
+            self.register_hook(self._incremental)
+        # Leaves are cheaper to score incrementally than in batches. 'batch_leaves' only applies without an incremental
+        # evaluator.
+        if engine_config['batch_leaves'] and self._incremental is None:
+            self._batch_func = heuristic_batch_eval(heuristic)
+        else:
+            self._batch_func = None
+        self._leaf_scores = dict()
+        self._root_player = root_player
+
+        # Scores are relative to the evaluation of the root player. Stored scores are meaningless for another player
+        # or another heuristic.
+        if self._tt_owner != (root_player, heuristic):
+            self.transposition_table.clear()
+            self._tt_owner = (root_player, heuristic)
+
+        self._canonical_tt = engine_config['canonical_tt']
+        self.transposition_table.new_search()
+        self.orderer.new_search()
+        self.stats = dict.fromkeys(self.stats, 0)
+        self._timer = timer
+        self.timed_out = False
+
+    def ai_move(self, player1_hex, player2_hex, heuristic, search='alphabeta'):
         """
-        Select a hex to play for the AI.
+        Select a hex to play for the AI. The player to move follows from the number of stones each player has.
         :param player1_hex: Set of hexes owned by player 1.
         :param player2_hex: Set of hexes owned by player 2.
-        :param player: Player indicator.
         :param heuristic: Which evaluation function to use.
+        :param search: 'alphabeta' or 'mcts'.
         :return:
         Tuple (x,y) of best move to make.
         """
-        heuristic_func = heuristic_eval(heuristic)
-        hex_dict = dict()
-        if self.first_type == 'ai':
-            hex_dict[0] = copy.deepcopy(player1_hex)
-            hex_dict[1] = copy.deepcopy(player2_hex)
-            is_max = True
-            player = 0
-            max_depth = 8
+        root_player = 1 if len(player1_hex) == len(player2_hex) else 2
+        max_depth = 8 if self.first_type == 'ai' else 3
+        time_to_move = self.time_move * 0.75
+        start = time()
+        # Known openings are played without searching.
+        if self.book is not None:
+            move = self.book.lookup(self.zhash)
+            if move is not None and move in self.move_gen.moves():
+                self.last_pv = [self.board.cells[move]]
+                return self.board.cells[move]
+        # Forcing lines first. A proven win is played at once; otherwise the solver only costs its time slice.
+        if engine_config['solver_time'] > 0:
+            self.last_solver, move = self.solver.solve(root_player, time_to_move * engine_config['solver_time'],
+                                                       engine_config['solver_depth'])
+            if self.last_solver == WIN:
+                self.last_pv = [self.board.cells[move]]
+                return self.board.cells[move]
+            time_to_move -= time() - start
+        if search == 'mcts':
+            return self._mcts_move(time_to_move)
+        if self.search_mode == 'lazy_smp' and self.lazy_smp is None:
+            self.lazy_smp = LazySMPSearch(self.geometry, engine_config['tt_size_mb'],
+                                          engine_config['search_workers'])
+            # From now on the table lives in shared memory. Its owner is unknown.
+            self.transposition_table = self.lazy_smp.transposition_table
+            self._tt_owner = None
+        self.prepare_search(heuristic, root_player, (time(), time_to_move))
+
+        if self.search_mode == 'lazy_smp':
+            pv = self.lazy_smp.search(self, player1_hex, player2_hex, heuristic, max_depth)
+        elif self.search_mode == 'root_split':
+            if self.root_split is None:
+                self.root_split = RootSplitSearch(self.geometry, engine_config['search_workers'])
+            pv = self.root_split.search(self, player1_hex, player2_hex, heuristic, max_depth)
         else:
-            hex_dict[0] = copy.deepcopy(player1_hex)
-            hex_dict[1] = copy.deepcopy(player2_hex)
-            is_max = 1
-            player = 0
-            max_depth = 3
-
-
+            pv = self._iterative_deepening(max_depth)
 
-        time_to_move = _TIME_MOVE * 0.75
+        self.last_pv = [self.board.cells[m] for m in pv]
+        # Not even the first depth finished. Fall back to any valid move.
+        if not pv:
+            return self.check_valid_moves()[0]
+        return self.board.cells[pv[0]]
 
-        start_time = time()
-        iterative_deep_step = 1
-        val = 0
-        move = None
-        while time() - start_time < time_to_move:
-            val_aux, move_aux = self._minimax(iterative_deep_step, hex_dict, is_max, heuristic_func, (start_time, time_to_move), player)
-            iterative_deep_step += 1
-            if val_aux > val:
-                move = move_aux
-                val = val_aux
+    def close(self):
+        """
+        Stop the worker processes of the parallel searches and release their shared memory. The engine can still be
+        used afterwards, workers are started again when needed.
+        :return:
+        """
+        if self.lazy_smp is not None:
+            # The current table is a view on the shared block.
+            self.transposition_table = TranspositionTable(engine_config['tt_size_mb'])
+            self._tt_owner = None
+            self.lazy_smp.close()
+            self.lazy_smp = None
+        if self.root_split is not None:
+            self.root_split.close()
+            self.root_split = None
+        # Single process trees have nothing to release and are kept for reuse.
+        if isinstance(self.mcts, RootParallelMCTS):
+            self.mcts.close()
+            self.mcts = None
+
+    def _mcts_move(self, time_to_move):
+        """
+        Select a move with Monte Carlo tree search from the current board position.
+        :param time_to_move: Allowed time in seconds.
+        :return:
+        Tuple (x,y) of best move to make.
+        """
+        if self.mcts is None:
+            args = (self.geometry, _CENTER, 2 * _MAX_MOVES, engine_config['mcts_exploration'])
+            if self.mcts_workers > 1:
+                self.mcts = RootParallelMCTS(*args, num_workers=self.mcts_workers)
+            else:
+                self.mcts = MCTS(*args)
+        move = best_move(self.mcts.search(self.board.bits[1], self.board.bits[2], time_to_move))
+        self.last_pv = [] if move is None else [self.board.cells[move]]
+        if move is None:
+            return self.check_valid_moves()[0]
+        return self.board.cells[move]
+
+    def _iterative_deepening(self, max_depth):
+        """
+        Serial iterative deepening. Search state must be set with 'prepare_search' first.
+        :param max_depth: Depth limit. Depths 1 to max_depth - 1 are searched.
+        :return:
+        Principal variation of the last completed depth, as a list of cell indices.
+        """
+        window = engine_config['aspiration_window']
+        val = None
+        pv = []
+        for depth in range(1, max_depth):
+            # Aspiration window around the score of the previous iteration.
+            if val is None:
+                alpha, beta = float('-inf'), float('inf')
+            else:
+                alpha, beta = val - window, val + window
+            while True:
+                # Principal variation of the previous iteration is searched first.
+                val_aux, pv_aux = self._negamax(depth, alpha, beta, pv_move=pv[0] if pv else None)
+                if self.timed_out:
+                    break
+                # Score fell outside the window. Search again with that side open.
+                if val_aux <= alpha:
+                    alpha = float('-inf')
+                elif val_aux >= beta:
+                    beta = float('inf')
+                else:
+                    break
 
-            if iterative_deep_step >= max_depth:
+            if self.timed_out:
+                # Partial depth. Its best move was fully searched and already beats the lower end of the window, so it
+                # is at least as good as the previous best. Otherwise keep the last completed depth.
+                if pv_aux and val_aux > alpha:
+                    pv = pv_aux
                 break
-
-        return tuple(move)
\ No newline at end of file
+            val, pv = val_aux, pv_aux
+            self.stats['depth'] = depth
+        return pv
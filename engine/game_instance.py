@@ -3,19 +3,35 @@ import pickle
 import time
 from itertools import chain
 from time import sleep
-import h5py
 from configs import *
+from engine.game_database import GameDatabase
 from engine.game_engine import GameEngine
 from engine.player import Player
-from gui.gui_builder import GameWindow
+try:
+    import pygame
+    from gui.gui_builder import GameWindow
+except ImportError:
+    # Servers without pygame can still play headless games.
+    pygame = None
 
 
 class GameInstance:
-    def __init__(self):
-        self.player1 = Player('1', player_config['types'][0])
-        self.player2 = Player('2', player_config['types'][1])
-        self.game_board = GameWindow(window_config['resolution'], window_config['size'], window_config['hexes'])
-        self.game_board.draw_display(True)
+    def __init__(self, headless=False):
+        """
+        :param headless: Play without a window. The engine is built from the static board geometry, nothing is drawn
+                         and pygame is not needed. Both players are ai, whatever the configured types.
+        """
+        types = ('ai', 'ai') if headless else player_config['types']
+        self.player1 = Player('1', types[0])
+        self.player2 = Player('2', types[1])
+        self.headless = headless
+        if headless:
+            self.game_board = None
+        else:
+            if pygame is None:
+                raise ImportError('pygame is required to play with a window.')
+            self.game_board = GameWindow(window_config['resolution'], window_config['size'], window_config['hexes'])
+            self.game_board.draw_display(True)
         self.game_engine = GameEngine(self.game_board, self.player1)
         self.turns_played = 0
         # Four functions for four different types of game.
@@ -137,7 +153,8 @@ class GameInstance:
             if not self.game_ended:
                 move = self.game_engine.ai_move(self.player1.hex_list,
                                                 self.player2.hex_list,
-                                                self.player2.heuristic)
+                                                self.player2.heuristic,
+                                                self.player2.search)
                 self.play_piece(move)
 
     def _run_p1_ai_p2_human(self):
@@ -151,7 +168,8 @@ class GameInstance:
             if not self.game_ended:
                 move = self.game_engine.ai_move(self.player1.hex_list,
                                                 self.player2.hex_list,
-                                                self.player1.heuristic)
+                                                self.player1.heuristic,
+                                                self.player1.search)
                 self.play_piece(move)
 
     def _run_p1_ai_p2_ai(self):
@@ -162,14 +180,19 @@ class GameInstance:
         if not self.game_ended:
             if self.turns_played % 2 == 0:
                 heuristic_type = self.player1.heuristic
+                search_type = self.player1.search
             else:
                 heuristic_type = self.player2.heuristic
+                search_type = self.player2.search
             move = self.game_engine.ai_move(self.player1.hex_list,
                                             self.player2.hex_list,
-                                            heuristic_type)
+                                            heuristic_type,
+                                            search_type)
             self.play_piece(move)
-            sleep(1)
-            pygame.event.get()
+            # Leave time to follow the game on screen.
+            if not self.headless:
+                sleep(1)
+                pygame.event.get()
 
     def _check_if_open(self, cell):
         """
@@ -194,10 +217,23 @@ class GameInstance:
         hex_p2 = self.player2.hex_list
         hex_played = set(hex_p1).union(hex_p2)
 
-        neigh_cell = set(self.game_board.map.spread(cell))
+        neigh_cell = self._neighborhood(cell)
         hex_count = hex_played.intersection(neigh_cell)
         return len(hex_count)
 
+    def _neighborhood(self, cell):
+        """
+        Cell and its neighbours, read from the static board geometry.
+        :param cell: Tuple (x,y).
+        :return:
+        Set of tuples (x,y). Empty for hexes outside the board.
+        """
+        board = self.game_engine.board
+        idx = board.index.get(cell)
+        if idx is None:
+            return set()
+        return {cell}.union(board.cells[n] for n in board.neighbors[idx])
+
     def _check_cell(self, cell):
         """
         Validate if cell is playable.
@@ -213,13 +249,13 @@ class GameInstance:
 
     def _add(self, cell, player):
         """
-        GUI and backend management of plays without validity checks. Change the hex color. Set owner in board graph.
+        GUI and backend management of plays without validity checks. Change the hex color. Set owner in board.
         Add move to correct player. Increment turn counter.
         :param cell: Tuple (x,y).
         :param player:
         :return:
         """
-        self.game_board.change_cell_color(cell, player.color)
+        self._paint(cell, player.color)
         self.game_engine.set_owner(cell, player.number)
         player.hex_list.add(cell)
         player.move_list.append(cell)
@@ -227,26 +263,26 @@ class GameInstance:
 
     def _check_and_add(self, cell, player):
         """
-        GUI and backend management of plays without validity checks. Change the hex color. Set owner in board graph.
+        GUI and backend management of plays without validity checks. Change the hex color. Set owner in board.
         Add move to correct player. Increment turn counter. Check if game has ended.
         :param cell: Tuple (x,y).
         :param player:
         :return:
         """
         # Check for validity of the move
-        if self._check_cell(cell):
-            self.game_board.change_cell_color(cell, player.color)
+        placed = self._check_cell(cell)
+        if placed:
+            self._paint(cell, player.color)
             self.game_engine.set_owner(cell, player.number)
             player.hex_list.add(cell)
             player.move_list.append(cell)
             self.turns_played += 1
 
-        # If a few plays have been made start checking for game end.
-        if len(self.player1.hex_list) >= 2 or len(self.player2.hex_list) >= 2:
+        # If a few plays have been made start checking for game end. Only the stone just played can end the game.
+        if placed and (len(self.player1.hex_list) >= 2 or len(self.player2.hex_list) >= 2):
             result = []
-            surrounded1, colinear1, surrounded2, colinear2 = self.game_engine.check_for_game_end(self.player1.hex_list,
-                                                                                                 self.player2.hex_list,
-                                                                                                 details=True)
+            surrounded1, colinear1, surrounded2, colinear2 = self.game_engine.check_win_after(cell, int(player.number),
+                                                                                              details=True)
             p0_won = surrounded1 or colinear1
             p1_won = surrounded2 or colinear2
             # Print message based on game result
@@ -265,28 +301,16 @@ class GameInstance:
                 result = (0, -1, -1)
                 self.game_ended = 1
 
-            # Save a small log file
+            # Append the game to the database
             if self.game_ended:
                 end_time = time.time() - self.start_time
                 print("Game finished in {} seconds".format(end_time))
-                with h5py.File(os.path.join(save_config['root_dir'], 'log_{}.h5'.format(time.time())), 'w') as game_log:
-                    sess_id = str(len(game_log.keys()))
-                    session_log = game_log.create_group(sess_id)
-                    session_log.create_dataset(name='win', data=result)
-                    session_log.create_dataset(name='time', data=end_time)
-
-                    p1_log = session_log.create_group('p1')
-                    if self.player1.type == 'ai':
-                        p1_log.create_dataset(name='heuristic', data=self.player1.heuristic)
-                    p1_log.create_dataset(name='surrounded', data=surrounded1)
-                    p1_log.create_dataset(name='colinear', data=colinear1)
-
-                    p2_log = session_log.create_group('p2')
-                    if self.player2.type == 'ai':
-                        p2_log.create_dataset(name='heuristic', data=self.player2.heuristic)
-                    p2_log.create_dataset(name='surrounded', data=surrounded2)
-                    p2_log.create_dataset(name='colinear', data=colinear2)
-                self.game_board.running = False
+                players = [(player.heuristic if player.type == 'ai' else None, player.move_list)
+                           for player in (self.player1, self.player2)]
+                with GameDatabase(save_config['database']) as database:
+                    database.append(result, end_time, (surrounded1, colinear1, surrounded2, colinear2), players)
+                if not self.headless:
+                    self.game_board.running = False
 
     def add_piece(self, cell, first=False):
         """
@@ -309,10 +333,10 @@ class GameInstance:
         # Center cell for standard board. Hardcoded
         center_cell = (16, 9)
         if self.turns_played == 0:
-            center_nn = set(self.game_board.map.spread(center_cell, radius=1))
+            center_nn = self._neighborhood(center_cell)
         else:
-            center_nn = set(self.game_board.map.spread(center_cell, radius=1))
-            player1_nn = set(self.game_board.map.spread(self.player1.move_list[0], radius=1))
+            center_nn = self._neighborhood(center_cell)
+            player1_nn = self._neighborhood(self.player1.move_list[0])
             center_nn = center_nn.intersection(player1_nn)
         if cell in center_nn and self._check_if_open(cell):
             self.add_piece(cell, True)
@@ -337,14 +361,32 @@ class GameInstance:
         elif self._check_if_open(cell):
             self.add_piece(cell)
 
+    def _paint(self, cell, color):
+        """
+        Change the color of a hex on screen. Nothing to do for headless games.
+        :param cell: Tuple (x,y).
+        :param color: RGBA tuple.
+        :return:
+        """
+        if not self.headless:
+            self.game_board.change_cell_color(cell, color)
+
     def run(self):
-        # main loop
-        while self.game_board.running:
-            self._run_func()
-        if not self.game_board.running:
-            "Save a capture of the final board state"
-            pygame.image.save(self.game_board.window, os.path.join(save_config['root_dir'],
-                                                                   "screenshot{}.jpg".format(time.time())))
+        try:
+            if self.headless:
+                while not self.game_ended:
+                    self._run_func()
+                return
+            # main loop
+            while self.game_board.running:
+                self._run_func()
+            if not self.game_board.running:
+                "Save a capture of the final board state"
+                pygame.image.save(self.game_board.window, os.path.join(save_config['root_dir'],
+                                                                       "screenshot{}.jpg".format(time.time())))
+        finally:
+            # Search worker processes and shared memory.
+            self.game_engine.close()
 
 
 if __name__ == "__main__":
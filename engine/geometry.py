@@ -0,0 +1,179 @@
+import os
+import tempfile
+from functools import lru_cache
+import numpy as np
+
+# Neighbour offsets in the same order as gui.hex.map.Map.directions. Consecutive offsets are neighbours themselves, so
+# the order also walks the ring around a cell.
+_DIRECTIONS = [(0, 1), (1, 1), (1, 0), (0, -1), (-1, -1), (-1, 0)]
+# The three line axes of the board. Same directions used by the colinearity rules.
+_AXES = [(1, 0), (1, 1), (0, 1)]
+# Hardcoded as per the game rules.
+_LENGTH_WIN = 5
+_CENTER = (16, 9)
+# Cached geometries are stored next to this file.
+_CACHE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Arrays saved to and loaded from the cache. Everything else is derived from them.
+_FIELDS = ('cells', 'neighbors', 'windows', 'window_axes', 'edges', 'distances', 'symmetries')
+
+
+def hex_cells(hexes):
+    """
+    Cells of the standard board, a hexagon around the center cell.
+    :param hexes: Number of hexes per side of the board.
+    :return:
+    List of tuples (x,y).
+    """
+    radius = hexes - 1
+    cx, cy = _CENTER
+    return [(x, y) for x in range(cx - radius, cx + radius + 1) for y in range(cy - radius, cy + radius + 1)
+            if abs((x - cx) - (y - cy)) <= radius]
+
+
+def _symmetry_maps():
+    """
+    The 12 symmetries of the hexagonal grid around the origin: 6 rotations, each with and without a reflection.
+    :return:
+    List of functions mapping an offset (dx,dy) to the transformed offset. The identity comes first.
+    """
+    def _rotate(dx, dy, times):
+        # 60 degrees rotation, following the ring order of '_DIRECTIONS'.
+        for _ in range(times):
+            dx, dy = dy, dy - dx
+        return dx, dy
+
+    maps = []
+    for reflect in (False, True):
+        for times in range(len(_DIRECTIONS)):
+            maps.append(lambda dx, dy, t=times, r=reflect: _rotate(dy, dx, t) if r else _rotate(dx, dy, t))
+    return maps
+
+
+def _all_pairs_distances(neighbors):
+    """
+    Breadth first search from every cell at the same time, as boolean products with the adjacency matrix.
+    :param neighbors: (cells, 6) neighbour table. -1 outside the board.
+    :return:
+    (cells, cells) int16 array of step distances. -1 for cells that are not connected.
+    """
+    num_cells = len(neighbors)
+    adjacency = np.zeros((num_cells, num_cells))
+    rows, cols = np.nonzero(neighbors >= 0)
+    adjacency[rows, neighbors[rows, cols]] = 1
+    distances = np.full((num_cells, num_cells), -1, dtype=np.int16)
+    np.fill_diagonal(distances, 0)
+    reached = np.eye(num_cells, dtype=bool)
+    step = 0
+    while True:
+        step += 1
+        frontier = ((reached @ adjacency) > 0) & ~reached
+        if not frontier.any():
+            break
+        distances[frontier] = step
+        reached |= frontier
+    return distances
+
+
+class Geometry:
+    def __init__(self, cells):
+        """
+        Static tables of a board layout. Computed once and shared by everything that needs to walk the board.
+        :param cells: Iterable of playable hexes as tuples (x,y).
+        """
+        cells = sorted((int(x), int(y)) for x, y in cells)
+        index = {cell: idx for idx, cell in enumerate(cells)}
+        # Cell coordinates, indexed by cell index.
+        self.cells = np.array(cells, dtype=np.int16).reshape(-1, 2)
+        # Neighbour of every cell in each of the six directions. -1 outside the board.
+        self.neighbors = np.array([[index.get((x + dx, y + dy), -1) for dx, dy in _DIRECTIONS] for x, y in cells],
+                                  dtype=np.int16).reshape(-1, len(_DIRECTIONS))
+        # Every run of '_LENGTH_WIN' consecutive cells along an axis, with the axis it lies on.
+        windows = []
+        window_axes = []
+        for x, y in cells:
+            for axis, (dx, dy) in enumerate(_AXES):
+                window = [index.get((x + dx * step, y + dy * step)) for step in range(_LENGTH_WIN)]
+                if None not in window:
+                    windows.append(window)
+                    window_axes.append(axis)
+        self.windows = np.array(windows, dtype=np.int16).reshape(-1, _LENGTH_WIN)
+        self.window_axes = np.array(window_axes, dtype=np.int8)
+        # Cells on the border of the board.
+        self.edges = np.flatnonzero((self.neighbors < 0).any(axis=1)).astype(np.int16)
+        self.distances = _all_pairs_distances(self.neighbors)
+        # Cell permutations of the symmetries around the center that map the board onto itself. Row 0 is the identity.
+        symmetries = []
+        cx, cy = _CENTER
+        for transform in _symmetry_maps():
+            offsets = [transform(x - cx, y - cy) for x, y in cells]
+            perm = [index.get((cx + dx, cy + dy)) for dx, dy in offsets]
+            if None not in perm:
+                symmetries.append(perm)
+        self.symmetries = np.array(symmetries, dtype=np.int16).reshape(-1, len(cells))
+        self._init_lookups()
+
+    def _init_lookups(self):
+        """
+        Python side lookups, rebuilt from the arrays.
+        :return:
+        """
+        self.num_cells = len(self.cells)
+        self.index = {(x, y): idx for idx, (x, y) in enumerate(self.cells.tolist())}
+
+    def save(self, path):
+        """
+        Store the tables as a NumPy .npz file. The file is written next to 'path' and renamed into place, so other
+        processes never read a partial file.
+        :param path: File path.
+        :return:
+        """
+        fd, tmp_path = tempfile.mkstemp(suffix='.npz', dir=os.path.dirname(path) or '.')
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                np.savez(tmp_file, **{name: getattr(self, name) for name in _FIELDS})
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load tables stored with 'save'.
+        :param path: File path.
+        :return:
+        Geometry object.
+        """
+        geometry = cls.__new__(cls)
+        with np.load(path) as data:
+            for name in _FIELDS:
+                setattr(geometry, name, data[name])
+        geometry._init_lookups()
+        return geometry
+
+
+@lru_cache(maxsize=None)
+def board_geometry(hexes=10):
+    """
+    Geometry of the standard board. Loaded from the on-disk cache when available, computed and cached otherwise.
+    :param hexes: Number of hexes per side of the board.
+    :return:
+    Geometry object.
+    """
+    cells = np.array(sorted(hex_cells(hexes)), dtype=np.int16)
+    path = os.path.join(_CACHE_DIR, 'geometry_{}.npz'.format(hexes))
+    if os.path.exists(path):
+        try:
+            geometry = Geometry.load(path)
+            if np.array_equal(geometry.cells, cells):
+                return geometry
+        except Exception:
+            # Corrupt or outdated cache. Recomputed and overwritten below.
+            pass
+    geometry = Geometry(cells)
+    try:
+        geometry.save(path)
+    except OSError:
+        # Read-only install. The tables are simply recomputed next time.
+        pass
+    return geometry
@@ -1,56 +1,14 @@
 import numpy as np
-import networkx as nx
+from engine.board import popcount
+from engine.threats import ThreatTable
 from scipy.spatial.distance import cdist
 
 
-def _cost_func(graph, node_u, node_v, player):
-    """
-    Simple piecewise definition of hex transition costs. Empty -> Allied, Allied -> Empty and Allied -> Allied have a
-    small associated cost.
-    :param graph: NetworkX Graph object to traverse.
-    :param node_u:
-    :param node_v:
-    :param player: Which player stones are allied and which are opposing.
-    :return:
-    Scalar value.
-    """
-    weight_dict_p1 = {
-        (-1, -1): 1,
-        (-1, 1): 1,
-        (-1, 2): 1e6,
-        (1, -1): 1,
-        (1, 1): 1,
-        (1, 2): 1e6,
-        (2, -1): 1e6,
-        (2, 1): 1e6,
-        (2, 2): 1e6,
-    }
-    weight_dict_p2 = {
-        (-1, -1): 1,
-        (-1, 1): 1e6,
-        (-1, 2): 1,
-        (1, -1): 1e6,
-        (1, 1): 1e6,
-        (1, 2): 1e6,
-        (2, -1): 1,
-        (2, 1): 1e6,
-        (2, 2): 1,
-    }
-    u = graph.nodes[node_u]['owner']
-    v = graph.nodes[node_v]['owner']
-    if player == -1:
-        return 1
-    elif player == 1:
-        return weight_dict_p1[(u, v)]
-    else:
-        return weight_dict_p2[(u, v)]
-
-
-def _compute_hex_score(player, graph, valid_moves):
+def _compute_hex_score(player, board, valid_moves):
     """
     Evaluation function based on the hex state. Per hex a score is computed based on the adjacent spaces.
     :param player: Player considered as "self".
-    :param graph: NetworkX Graph object.
+    :param board: Board object.
     :param valid_moves: Deprecated. Used for testing.
     :return:
     Score for 'player' and opponent hexes.
@@ -66,82 +24,205 @@ def _compute_hex_score(player, graph, valid_moves):
         opponent_val: 0
     }
 
-    occupied_self = [n for n in graph.nodes if graph.nodes[n]['owner'] is own_val]
-    occupied_other = [n for n in graph.nodes if graph.nodes[n]['owner'] is opponent_val]
+    owners = board.owners
     self_score = 0
-    for ocs in occupied_self:
-        for neigh in graph.neighbors(tuple(ocs)):
-            if not neigh == ocs:
-                self_score += value_dict[graph.nodes[neigh]['owner']]
+    for ocs in board.stones(own_val):
+        for neigh in board.neighbors[ocs]:
+            self_score += value_dict[owners[neigh]]
 
     other_score = 0
-    for ocs in occupied_other:
-        for neigh in graph.neighbors(tuple(ocs)):
-            if not neigh == ocs:
-                other_score += value_dict[graph.nodes[neigh]['owner']]
+    for ocs in board.stones(opponent_val):
+        for neigh in board.neighbors[ocs]:
+            other_score += value_dict[owners[neigh]]
     return self_score, other_score
 
 
-def _hex_heuristic(player, graph, valid_moves):
+def _hex_heuristic(player, board, valid_moves):
     """
     Hex evaluation function as a ratio of self_score and other_score.
     :param player: Player considered as "self".
-    :param graph: NetworkX Graph object.
+    :param board: Board object.
     :param valid_moves: Deprecated. Used for testing.
     :return:
     A numeric score for a given boardstate.
     """
-    self_score, other_score = _compute_hex_score(player, graph, valid_moves)
+    self_score, other_score = _compute_hex_score(player, board, valid_moves)
     score = self_score #/ max((1, 2 * other_score))
     return np.max((0, score)), None
 
 
-def _compute_distances(player, graph, valid_moves):
+class _HexScoreHook:
+    def __init__(self, board):
+        """
+        Incremental version of '_compute_hex_score'. Keeps the hex score of both players and updates it from the
+        neighbours of the cell that changed, so a move costs a few bit operations instead of a walk over every stone.
+        :param board: Board object. The hook must be told about every change through 'place' and 'remove'.
+        """
+        self.board = board
+        # Indexed by owner (1 or 2). Entry 0 is unused.
+        self.scores = [0., 0., 0.]
+        self.reset()
+
+    def reset(self):
+        """
+        Full recomputation from the board.
+        :return:
+        """
+        self.scores = [0., _compute_hex_score(0, self.board, None)[0], _compute_hex_score(1, self.board, None)[0]]
+
+    def _delta(self, idx, player):
+        """
+        Change of both scores when a stone of 'player' appears on the empty cell 'idx'. Removal is the opposite.
+        :return:
+        Tuple (change of 'player''s score, change of the opponent's score).
+        """
+        board = self.board
+        neighbors = board.neighbor_masks[idx]
+        allied = popcount(neighbors & board.bits[player])
+        opposing = popcount(neighbors & board.bits[3 - player])
+        empty = len(board.neighbors[idx]) - allied - opposing
+        # The new stone scores its neighbours, allied neighbours see an empty cell (3.5) turn allied (5.0) and
+        # opposing neighbours see it turn into an opposing one (0).
+        return 3.5 * empty + 5.0 * allied + 1.5 * allied, -3.5 * opposing
+
+    def place(self, idx, player):
+        """
+        Called after a stone is placed.
+        :param idx: Cell index.
+        :param player: Player identifier (1 or 2).
+        :return:
+        """
+        own, other = self._delta(idx, player)
+        self.scores[player] += own
+        self.scores[3 - player] += other
+
+    def remove(self, idx, player):
+        """
+        Called before a stone is removed.
+        :param idx: Cell index.
+        :param player: Owner of the stone (1 or 2).
+        :return:
+        """
+        own, other = self._delta(idx, player)
+        self.scores[player] -= own
+        self.scores[3 - player] -= other
+
+    def evaluate(self, player):
+        """
+        Same result as '_hex_heuristic' for the current board.
+        :param player: Player considered as "self".
+        :return:
+        A numeric score for a given boardstate.
+        """
+        return np.max((0, self.scores[int(player) + 1])), None
+
+
+# Value of an open line window by number of stones in it. A window with 5 stones is a won game.
+_THREAT_WEIGHTS = (0, 1, 4, 16, 64, 1024)
+
+
+def _threat_heuristic(player, board, valid_moves):
+    """
+    Line threat evaluation. Every line window the opponent has no stone in is worth more the more stones 'player' has
+    in it. The opponent's open windows count against.
+    :param player: Player considered as "self".
+    :param board: Board object.
+    :param valid_moves: Deprecated. Used for testing.
+    :return:
+    A numeric score for a given boardstate.
+    """
+    own_val = int(player) + 1
+    opponent_val = int(not(player)) + 1
+    cells = board.occupancy()[board.geometry.windows]
+    own = np.count_nonzero(cells == own_val, axis=1)
+    other = np.count_nonzero(cells == opponent_val, axis=1)
+    weights = np.array(_THREAT_WEIGHTS)
+    score = np.sum(weights[own[other == 0]]) - np.sum(weights[other[own == 0]])
+    return float(score), None
+
+
+class _ThreatScoreHook(ThreatTable):
+    """
+    Incremental version of '_threat_heuristic', read from the open window counts of the threat table.
+    """
+
+    def evaluate(self, player):
+        """
+        Same result as '_threat_heuristic' for the current board.
+        :param player: Player considered as "self".
+        :return:
+        A numeric score for a given boardstate.
+        """
+        own_val = int(player) + 1
+        opponent_val = int(not(player)) + 1
+        score = 0
+        for weight, own, other in zip(_THREAT_WEIGHTS, self.open[own_val], self.open[opponent_val]):
+            score += weight * (own - other)
+        return float(score), None
+
+
+def _hex_heuristic_batch(player, board, occupancy):
+    """
+    Batched version of '_hex_heuristic'. The neighbour values of every cell are added up with a single product by the
+    adjacency matrix.
+    :param player: Player considered as "self".
+    :param board: Board object. Only its geometry is used.
+    :param occupancy: (positions, cells) array with the owner of every cell, -1 for empty cells.
+    :return:
+    NumPy array with one score per position.
+    """
+    own_val = int(player) + 1
+    own = occupancy == own_val
+    # Same values as '_compute_hex_score': 3.5 for empty neighbours, 5 for allied ones and 0 for the opponent's.
+    values = 3.5 * (occupancy == -1) + 5.0 * own
+    self_score = np.einsum('ij,ij->i', values @ board.adjacency, own)
+    return np.maximum(0, self_score)
+
+
+def _compute_distances(player, board, valid_moves):
     """
     Evaluation function computed as the distances between hexes.
     :param player: Player considered as "self".
-    :param graph: NetworkX Graph object.
+    :param board: Board object.
     :param valid_moves: Deprecated. Used for testing.
     :return:
     List of distances to nodes belonging to each player.
     """
     own_val = int(player) + 1
     opponent_val = int(not(player)) + 1
-    occupied_self = [n for n in graph.nodes if graph.nodes[n]['owner'] is own_val]
-    occupied_other = [n for n in graph.nodes if graph.nodes[n]['owner'] is opponent_val]
-    dist_to_self = []
-    dist_to_other = []
-
-    for o_self in occupied_self:
-        aux = []
-        for o_self2 in occupied_self:
-             if o_self == o_self2:
-                 pass
-             else:
-                aux.append(nx.shortest_path_length(graph, tuple(o_self2), o_self))
-        dist_to_self.append(aux)
-
-    for o_other in occupied_other:
-        aux = []
-        for o_other2 in occupied_other:
-            if o_other == o_other2:
-                pass
-            else:
-                aux.append(nx.shortest_path_length(graph, tuple(o_other2), o_other))
-        dist_to_other.append(aux)
+    dist_to_self = _pairwise_distances(board, board.stones(own_val))
+    dist_to_other = _pairwise_distances(board, board.stones(opponent_val))
     return dist_to_self, dist_to_other
 
 
-def _dist_self_min(player, graph,valid_moves):
+def _pairwise_distances(board, stones):
+    """
+    Distances between a group of stones, read from the precomputed distance table of the board.
+    :param board: Board object.
+    :param stones: List of cell indices.
+    :return:
+    One list per stone with its distance to every other stone of the group, in the order of 'stones'.
+    """
+    if not stones:
+        return []
+    dist = board.distances[np.ix_(stones, stones)]
+    if (dist < 0).any():
+        raise ValueError('Cells are not connected.')
+    # Drop the distance of every stone to itself.
+    off_diagonal = ~np.eye(len(stones), dtype=bool)
+    return dist[off_diagonal].reshape(len(stones), len(stones) - 1).tolist()
+
+
+def _dist_self_min(player, board, valid_moves):
     """
     Minimize distance to self.
     :param player: Player considered as "self".
-    :param graph: NetworkX Graph object.
+    :param board: Board object.
     :param valid_moves: Deprecated. Used for testing.
     :return:
     A numeric score for a given boardstate.
     """
-    dist_to_self, _ = _compute_distances(player, graph, valid_moves)
+    dist_to_self, _ = _compute_distances(player, board, valid_moves)
     dist_to_self = dist_to_self[0]
     if len(dist_to_self) > 0:
         ind = np.argmin(dist_to_self)
@@ -150,16 +231,16 @@ def _dist_self_min(player, graph,valid_moves):
         return 0, None
 
 
-def _dist_other_max(player, graph, valid_moves):
+def _dist_other_max(player, board, valid_moves):
     """
     Maximize distance to other.
     :param player: Player considered as "self".
-    :param graph: NetworkX Graph object.
+    :param board: Board object.
     :param valid_moves: Deprecated. Used for testing.
     :return:
     A numeric score for a given boardstate.
     """
-    _, dist_to_other = _compute_distances(player, graph, valid_moves)
+    _, dist_to_other = _compute_distances(player, board, valid_moves)
 
     if len(dist_to_other) > 0:
         ind = np.argmax(dist_to_other)
@@ -168,16 +249,16 @@ def _dist_other_max(player, graph, valid_moves):
         return 0, None
 
 
-def _dist_move_matrix(player, graph,valid_moves):
+def _dist_move_matrix(player, board, valid_moves):
     """
     Evaluation function. Computes the distance matrix of all moves and select the smallest one.
     :param player:
-    :param graph:
+    :param board:
     :param valid_moves:
     :return:
     A numeric score for a given boardstate.
     """
-    dist_to_self, dist_to_other = _compute_distances(player, graph, valid_moves)
+    dist_to_self, dist_to_other = _compute_distances(player, board, valid_moves)
     if len(dist_to_other) > 0 and len(dist_to_self) > 0 :
         aux = np.mean(cdist(np.expand_dims(dist_to_self, 1), np.expand_dims(dist_to_other, 1)), axis=0)
         ind = np.argmin(aux)
@@ -186,6 +267,16 @@ def _dist_move_matrix(player, graph,valid_moves):
         return 0, None
 
 
+# Every evaluation function, by name.
+_HEURISTICS = {
+    'dist_self_min': _dist_self_min,
+    'dist_other_max': _dist_other_max,
+    'dist_move_matrix': _dist_move_matrix,
+    'hex_heuristic': _hex_heuristic,
+    'threat_heuristic': _threat_heuristic,
+}
+
+
 def heuristic_eval(type):
     """
     Evaluation function lookup. Returns the type of heuristic used in evaluating the board state.
@@ -193,10 +284,41 @@ def heuristic_eval(type):
     :return:
     Function handle
     """
+    return _HEURISTICS[type]
+
+
+def heuristic_types():
+    """
+    :return:
+    List of the names accepted by 'heuristic_eval'.
+    """
+    return list(_HEURISTICS)
+
+
+def heuristic_batch_eval(type):
+    """
+    Batched evaluation function lookup. Batched functions take a (positions, cells) occupancy array instead of a board
+    state and return one score per position.
+    :param type: String. Dictionary key.
+    :return:
+    Function handle. None if the heuristic has no batched version.
+    """
+    heuristic_dict = {
+        'hex_heuristic': _hex_heuristic_batch,
+    }
+    return heuristic_dict.get(type)
+
+
+def heuristic_incremental(type):
+    """
+    Incremental evaluation lookup. Incremental evaluators are built on a board, must be notified of every stone placed
+    or removed and give the same result as the heuristic through 'evaluate'.
+    :param type: String. Dictionary key.
+    :return:
+    Class handle. None if the heuristic has no incremental version.
+    """
     heuristic_dict = {
-        'dist_self_min': _dist_self_min,
-        'dist_other_max': _dist_other_max,
-        'dist_move_matrix': _dist_move_matrix,
-        'hex_heuristic': _hex_heuristic,
+        'hex_heuristic': _HexScoreHook,
+        'threat_heuristic': _ThreatScoreHook,
     }
-    return heuristic_dict[type]
+    return heuristic_dict.get(type)
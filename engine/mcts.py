@@ -0,0 +1,296 @@
+import math
+import os
+import random
+import weakref
+from multiprocessing.pool import Pool
+from time import time
+from engine.board import Board, iter_bits
+from engine.enclosure import check_surrounded, may_enclose
+from engine.move_generator import MoveGenerator
+from engine.parallel import _release_pool
+
+# Default UCT exploration constant. sqrt(2) is the textbook value for rewards in [0, 1].
+_EXPLORATION = math.sqrt(2)
+# Game result values. Player identifiers (1 or 2) are used for wins.
+_DRAW = 0
+
+
+class _Node:
+    """
+    Search tree node. Statistics are kept from the point of view of the player that made the move leading to it.
+    """
+    __slots__ = ('move', 'parent', 'player', 'children', 'untried', 'visits', 'wins', 'result')
+
+    def __init__(self, move, parent, player, untried, result):
+        self.move = move
+        self.parent = parent
+        self.player = player
+        self.children = dict()
+        self.untried = untried
+        self.visits = 0
+        self.wins = 0.
+        # Winner, _DRAW or None while the game is still running.
+        self.result = result
+
+
+class MCTS:
+    def __init__(self, geometry, center, max_stones, exploration=_EXPLORATION, seed=None):
+        """
+        Monte Carlo tree search with UCT selection and uniformly random playouts. Playouts run on a private compact
+        board. The tree is kept between moves and reused when the new position is reachable from the old root.
+        :param geometry: Geometry object of the playable cells.
+        :param center: Tuple (x,y) where the first stone must be played.
+        :param max_stones: Number of stones at which the game is a draw.
+        :param exploration: UCT exploration constant. Higher values spread playouts over more moves.
+        :param seed: Seed of the random playouts. None for a random seed.
+        """
+        self.board = Board(geometry)
+        self.move_gen = MoveGenerator(self.board, self.board.index[center])
+        self.max_stones = max_stones
+        self.exploration = exploration
+        self._rng = random.Random(seed)
+        self.root = None
+        self._root_bits = (0, 0)
+        self.stats = {'playouts': 0, 'reused': 0}
+
+    def _place(self, idx, player):
+        self.board.place(idx, player)
+        self.move_gen.place(idx)
+
+    def _remove(self, idx):
+        self.board.remove(idx)
+        self.move_gen.remove(idx)
+
+    def _result_after(self, idx, player):
+        """
+        Game result right after 'player' put a stone on 'idx'. Only the mover can have completed a line or closed an
+        enclosure. A stone played into a hole of the opponent's wall surrounds the mover itself. Same precedence as
+        the search: a mover that both surrounds and is surrounded wins.
+        :param idx: Cell index.
+        :param player: Player identifier (1 or 2).
+        :return:
+        Winner, _DRAW or None if the game goes on.
+        """
+        board = self.board
+        if board.is_five(idx, player) or (may_enclose(board, idx, player) and check_surrounded(board, 3 - player)):
+            return player
+        # A stone touching an allied one can't be cut off from the rest.
+        if not board.neighbor_masks[idx] & board.bits[player] and check_surrounded(board, player):
+            return 3 - player
+        if self.move_gen.num_stones >= self.max_stones:
+            return _DRAW
+        return None
+
+    def _new_node(self, move, parent, player, result):
+        """
+        Create a node for the current board position.
+        :return:
+        _Node object.
+        """
+        untried = [] if result is not None else self.move_gen.moves()
+        self._rng.shuffle(untried)
+        return _Node(move, parent, player, untried, result)
+
+    def set_position(self, bits1, bits2):
+        """
+        Move the root to a new position. The subtree of the position is kept if it can be reached from the current
+        root playing at most one stone per player.
+        :param bits1: Bitmask of the stones of player 1.
+        :param bits2: Bitmask of the stones of player 2.
+        :return:
+        """
+        old1, old2 = self._root_bits
+        node = self.root
+        new1, new2 = bits1 & ~old1, bits2 & ~old2
+        if node is not None and not (old1 & ~bits1 or old2 & ~bits2) and new1 & (new1 - 1) == new2 & (new2 - 1) == 0:
+            # Players alternate, so the stone of the player to move at the root was played first.
+            first, second = (new1, new2) if node.player == 2 else (new2, new1)
+            if first or not second:
+                for move in (first, second):
+                    if move and node is not None:
+                        node = node.children.get(move.bit_length() - 1)
+            else:
+                node = None
+        else:
+            node = None
+
+        for idx in self.board.stones(1) + self.board.stones(2):
+            self._remove(idx)
+        for player, bits in ((1, bits1), (2, bits2)):
+            for idx in iter_bits(bits):
+                self._place(idx, player)
+        self._root_bits = (bits1, bits2)
+
+        if node is not None:
+            node.parent = None
+            self.stats['reused'] = node.visits
+        else:
+            # Player 1 always starts, so the last stone was played by player 2 if the count is even.
+            last = 2 if self.move_gen.num_stones % 2 == 0 else 1
+            node = self._new_node(None, None, last, None)
+            self.stats['reused'] = 0
+        self.root = node
+
+    def _select(self, node):
+        """
+        UCT selection among the children of a fully expanded node.
+        :param node: _Node object.
+        :return:
+        Child with the highest upper confidence bound.
+        """
+        log_visits = math.log(node.visits)
+        exploration = self.exploration
+        best, best_value = None, float('-inf')
+        for child in node.children.values():
+            value = child.wins / child.visits + exploration * math.sqrt(log_visits / child.visits)
+            if value > best_value:
+                best, best_value = child, value
+        return best
+
+    def _playout(self):
+        """
+        Play uniformly random moves from the current position until the game ends. The board is restored afterwards.
+        :return:
+        Winner or _DRAW.
+        """
+        rng = self._rng
+        played = []
+        result = None
+        while result is None:
+            moves = self.move_gen.moves()
+            if not moves:
+                result = _DRAW
+                break
+            player = 1 + self.move_gen.num_stones % 2
+            idx = moves[int(rng.random() * len(moves))]
+            self._place(idx, player)
+            played.append(idx)
+            result = self._result_after(idx, player)
+        for idx in reversed(played):
+            self._remove(idx)
+        return result
+
+    def _iterate(self):
+        """
+        One selection, expansion, playout and backpropagation step.
+        :return:
+        """
+        node = self.root
+        played = []
+        while node.result is None and not node.untried and node.children:
+            node = self._select(node)
+            self._place(node.move, node.player)
+            played.append(node.move)
+
+        if node.result is None and node.untried:
+            move = node.untried.pop()
+            player = 3 - node.player
+            self._place(move, player)
+            played.append(move)
+            child = self._new_node(move, node, player, self._result_after(move, player))
+            node.children[move] = child
+            node = child
+
+        result = node.result if node.result is not None else self._playout()
+        while node is not None:
+            node.visits += 1
+            if result == node.player:
+                node.wins += 1
+            elif result == _DRAW:
+                node.wins += 0.5
+            node = node.parent
+
+        for idx in reversed(played):
+            self._remove(idx)
+        self.stats['playouts'] += 1
+
+    def search(self, bits1, bits2, time_limit):
+        """
+        Run playouts from a position until the time is up.
+        :param bits1: Bitmask of the stones of player 1.
+        :param bits2: Bitmask of the stones of player 2.
+        :param time_limit: Allowed time in seconds.
+        :return:
+        Dictionary mapping every searched root move (cell index) to its number of visits.
+        """
+        start = time()
+        self.stats['playouts'] = 0
+        self.set_position(bits1, bits2)
+        if self.root.result is None:
+            while time() - start < time_limit:
+                self._iterate()
+        return {move: child.visits for move, child in self.root.children.items()}
+
+
+def best_move(visits):
+    """
+    Robust child selection: the most visited root move.
+    :param visits: Dictionary mapping cell indices to visit counts.
+    :return:
+    Cell index or None if no move was searched.
+    """
+    if not visits:
+        return None
+    return max(visits, key=visits.get)
+
+
+# Per worker process tree. Set by '_init_worker'.
+_worker_mcts = None
+
+
+def _init_worker(geometry, center, max_stones, exploration):
+    """
+    Worker process initializer. Every worker keeps its own tree, seeded differently, for the whole life of the pool.
+    :return:
+    """
+    global _worker_mcts
+    _worker_mcts = MCTS(geometry, center, max_stones, exploration, seed=os.getpid())
+
+
+def _search_worker(task):
+    """
+    :param task: Tuple (bits1, bits2, time_limit).
+    :return:
+    Tuple (root visits, playouts).
+    """
+    visits = _worker_mcts.search(*task)
+    return visits, _worker_mcts.stats['playouts']
+
+
+class RootParallelMCTS:
+    def __init__(self, geometry, center, max_stones, exploration=_EXPLORATION, num_workers=None):
+        """
+        Root parallelization. Every worker grows an independent tree from the same position and the root visit counts
+        are added up at the end.
+        :param geometry: Geometry object of the playable cells.
+        :param center: Tuple (x,y) where the first stone must be played.
+        :param max_stones: Number of stones at which the game is a draw.
+        :param exploration: UCT exploration constant.
+        :param num_workers: Number of worker processes. Defaults to the number of CPUs.
+        """
+        self.num_workers = num_workers or os.cpu_count()
+        self.pool = Pool(self.num_workers, initializer=_init_worker,
+                         initargs=(geometry, center, max_stones, exploration))
+        self._finalizer = weakref.finalize(self, _release_pool, self.pool)
+        self.stats = {'playouts': 0}
+
+    def close(self):
+        """
+        Stop the worker processes.
+        :return:
+        """
+        self._finalizer()
+
+    def search(self, bits1, bits2, time_limit):
+        """
+        Same interface as 'MCTS.search'.
+        :return:
+        Dictionary mapping every searched root move (cell index) to its number of visits, summed over the workers.
+        """
+        results = self.pool.map(_search_worker, [(bits1, bits2, time_limit)] * self.num_workers, chunksize=1)
+        visits = dict()
+        for worker_visits, _ in results:
+            for move, count in worker_visits.items():
+                visits[move] = visits.get(move, 0) + count
+        self.stats['playouts'] = sum(r[1] for r in results)
+        return visits
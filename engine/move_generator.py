@@ -0,0 +1,68 @@
+from engine.board import iter_bits
+
+
+class MoveGenerator:
+    def __init__(self, board, center):
+        """
+        Incremental legal move generator. Keeps, for every cell, the number of occupied neighbours together with two
+        frontier bitmasks: cells with at least one and cells with at least two occupied neighbours. Both are updated
+        on every placement and removal so no board scan is needed to list the legal moves.
+        :param board: Board object. Must be updated by the caller alongside this object.
+        :param center: Index of the cell where the first stone must be played.
+        """
+        self.board = board
+        self.center = center
+        self.counts = [0] * board.num_cells
+        self.frontier1 = 0
+        self.frontier2 = 0
+        self.num_stones = 0
+
+    def place(self, idx):
+        """
+        Register a stone placed on 'idx'.
+        :param idx: Cell index.
+        :return:
+        """
+        counts = self.counts
+        for n in self.board.neighbors[idx]:
+            counts[n] += 1
+            if counts[n] == 1:
+                self.frontier1 |= 1 << n
+            elif counts[n] == 2:
+                self.frontier2 |= 1 << n
+        self.num_stones += 1
+
+    def remove(self, idx):
+        """
+        Register a stone removed from 'idx'.
+        :param idx: Cell index.
+        :return:
+        """
+        counts = self.counts
+        for n in self.board.neighbors[idx]:
+            counts[n] -= 1
+            if counts[n] == 0:
+                self.frontier1 &= ~(1 << n)
+            elif counts[n] == 1:
+                self.frontier2 &= ~(1 << n)
+        self.num_stones -= 1
+
+    def moves(self):
+        """
+        Valid moves for the current position. First two moves follow the fixed opening rules, afterwards stones must
+        be adjacent to two others (one if no such cell exists).
+        :return:
+        List of cell indices.
+        """
+        empty = ~self.board.occupied
+        if self.num_stones == 0:
+            # Fixed start for this board size
+            return self.board.neighbors[self.center] + [self.center]
+        elif self.num_stones == 1:
+            if self.board.owners[self.center] != -1:
+                return list(iter_bits(self.frontier1 & empty))
+            return [self.center]
+        mask = self.frontier2 & empty
+        if not mask:
+            mask = self.frontier1 & empty
+        return list(iter_bits(mask))
@@ -0,0 +1,135 @@
+import random
+import numpy as np
+from engine.board import popcount
+
+# Killer moves kept per ply.
+_NUM_KILLERS = 2
+
+
+class RandomOrderer:
+    """
+    Random move order. Original behaviour of the search, kept as a baseline for benchmarks.
+    """
+
+    def new_search(self):
+        pass
+
+    def perturb(self, seed):
+        """
+        Reseed the shuffle. Parallel searchers use different seeds to explore the tree in different orders.
+        :param seed: Integer seed or None to restore the default.
+        :return:
+        """
+        np.random.seed(seed)
+
+    def order(self, board, moves, player, tt_move=None):
+        """
+        Shuffle the moves. The transposition table move is still tried first.
+        :param board: Board object.
+        :param moves: List of cell indices.
+        :param player: Player to move (1 or 2).
+        :param tt_move: Best move stored in the transposition table. None if not available.
+        :return:
+        Ordered list of cell indices.
+        """
+        moves = list(moves)
+        np.random.shuffle(moves)
+        if tt_move is not None and tt_move in moves:
+            moves.remove(tt_move)
+            moves.insert(0, tt_move)
+        return moves
+
+    def cutoff(self, board, move, player, depth):
+        pass
+
+
+class KillerHistoryOrderer:
+    """
+    Move ordering for alpha-beta: transposition table move first, then killer moves of the current ply, then moves
+    ranked by the history heuristic and finally by the number of adjacent allied stones.
+    """
+
+    def __init__(self, num_cells):
+        self.num_cells = num_cells
+        # Indexed by player (1 or 2) and cell index. Entry 0 is unused so player values can be used directly.
+        self.history = np.zeros((3, num_cells), dtype=np.int64)
+        # Indexed by the number of stones on the board, which identifies the ply independently of the search root.
+        self.killers = dict()
+        # Random tie-breaker. None keeps the order deterministic.
+        self._rng = None
+
+    def perturb(self, seed):
+        """
+        Break ties between equally ranked moves at random. Parallel searchers use different seeds to explore the tree
+        in different orders.
+        :param seed: Integer seed or None to restore the deterministic order.
+        :return:
+        """
+        self._rng = None if seed is None else random.Random(seed)
+
+    def new_search(self):
+        """
+        Age the statistics of previous searches. Killers are dropped and history scores halved.
+        :return:
+        """
+        self.killers = dict()
+        self.history //= 2
+
+    def order(self, board, moves, player, tt_move=None):
+        """
+        Sort the moves from most to least promising.
+        :param board: Board object.
+        :param moves: List of cell indices.
+        :param player: Player to move (1 or 2).
+        :param tt_move: Best move stored in the transposition table. None if not available.
+        :return:
+        Ordered list of cell indices.
+        """
+        history = self.history[player]
+        own = board.bits[player]
+        neighbor_masks = board.neighbor_masks
+        killers = self.killers.get(popcount(board.occupied), ())
+        rng = self._rng
+
+        def _key(move):
+            if move == tt_move:
+                return 3, 0, 0
+            if move in killers:
+                return 2, -killers.index(move), 0
+            allied = popcount(neighbor_masks[move] & own)
+            # Noise below 1 only reorders moves with the same allied count.
+            return 1, history[move], allied if rng is None else allied + rng.random()
+
+        return sorted(moves, key=_key, reverse=True)
+
+    def cutoff(self, board, move, player, depth):
+        """
+        Record a move that produced a beta cutoff.
+        :param board: Board object, in the position where 'move' was played.
+        :param move: Cell index.
+        :param player: Player that played the move (1 or 2).
+        :param depth: Remaining depth of the node. Deeper cutoffs weigh more.
+        :return:
+        """
+        self.history[player, move] += depth * depth
+        ply = popcount(board.occupied)
+        killers = self.killers.setdefault(ply, [])
+        if move in killers:
+            killers.remove(move)
+        killers.insert(0, move)
+        del killers[_NUM_KILLERS:]
+
+
+def move_orderer(type, num_cells):
+    """
+    Move ordering lookup. Returns the object used to order moves in the search.
+    :param type: String. Dictionary key.
+    :param num_cells: Number of cells of the board.
+    :return:
+    Move orderer object.
+    """
+    orderer_dict = {
+        'random': lambda: RandomOrderer(),
+        'killer_history': lambda: KillerHistoryOrderer(num_cells),
+    }
+    return orderer_dict[type]()
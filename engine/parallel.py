@@ -0,0 +1,260 @@
+import multiprocessing
+import weakref
+from multiprocessing.pool import Pool
+from multiprocessing.shared_memory import SharedMemory
+from time import time
+from engine.transposition import TranspositionTable, table_bytes
+
+# Per worker process state. Set by '_init_worker'.
+_worker_engine = None
+_worker_position = None
+_shared_alpha = None
+_shared_memory = None
+
+
+def _release_pool(pool, shared_memory=None):
+    """
+    Stop a pool of worker processes and unlink the shared memory block they used. Also run when the interpreter
+    exits, so the block does not outlive the process.
+    :param pool: Pool object.
+    :param shared_memory: SharedMemory object or None.
+    :return:
+    """
+    pool.close()
+    pool.join()
+    if shared_memory is not None:
+        shared_memory.unlink()
+
+
+def _init_worker(geometry, shared_alpha):
+    """
+    Worker process initializer. Every worker keeps its own engine, with its own compact board and transposition
+    table, for the whole life of the pool.
+    :param geometry: Geometry object of the playable cells.
+    :param shared_alpha: multiprocessing.Value holding the best root score found so far.
+    :return:
+    """
+    global _worker_engine, _shared_alpha
+    # Imported here as the engine module imports this one.
+    from engine.game_engine import GameEngine
+    _worker_engine = GameEngine(None, None, geometry=geometry)
+    _shared_alpha = shared_alpha
+
+
+def _search_root_move(task):
+    """
+    Search a single root move in a worker. The first move of every depth is searched with the full window. The rest
+    are searched with a null window around the shared alpha and searched again if they turn out better.
+    :param task: Tuple (player1_hex, player2_hex, move, depth, heuristic, root_player, timer, full_window).
+    :return:
+    Tuple (move, score, principal variation, exact, completed, nodes).
+    """
+    global _worker_position
+    player1_hex, player2_hex, move, depth, heuristic, root_player, timer, full_window = task
+    engine = _worker_engine
+    position = (frozenset(player1_hex), frozenset(player2_hex))
+    if _worker_position != position:
+        engine.set_position(player1_hex, player2_hex)
+        _worker_position = position
+    # Same timer means same search. Keep the tables and move ordering statistics of the previous tasks.
+    if engine._timer != timer:
+        engine.prepare_search(heuristic, root_player, timer)
+    engine.timed_out = False
+    nodes = engine.stats['nodes']
+
+    cell = engine.board.cells[move]
+    engine._set_temporary_owner(cell, root_player)
+    if full_window:
+        score, pv = engine._negamax(depth - 1, last_move=cell)
+        score = -score
+        exact = True
+    else:
+        alpha = _shared_alpha.value
+        score, pv = engine._negamax(depth - 1, -alpha - 1, -alpha, last_move=cell)
+        score = -score
+        exact = False
+        if score > alpha and not engine.timed_out:
+            score, pv = engine._negamax(depth - 1, float('-inf'), -alpha, last_move=cell)
+            score = -score
+            exact = True
+    engine._set_temporary_owner(cell, -1)
+
+    completed = not engine.timed_out
+    if completed and exact:
+        with _shared_alpha.get_lock():
+            if score > _shared_alpha.value:
+                _shared_alpha.value = score
+    return move, score, [move] + pv, exact, completed, engine.stats['nodes'] - nodes
+
+
+class RootSplitSearch:
+    def __init__(self, geometry, num_workers=None):
+        """
+        Parallel search that splits the root moves across a pool of worker processes. Workers receive the stones of
+        each player instead of a board and share the best root score found so far.
+        :param geometry: Geometry object of the playable cells.
+        :param num_workers: Number of worker processes. Defaults to the number of CPUs.
+        """
+        self.shared_alpha = multiprocessing.Value('d', float('-inf'))
+        self.pool = Pool(num_workers, initializer=_init_worker, initargs=(geometry, self.shared_alpha))
+        self._finalizer = weakref.finalize(self, _release_pool, self.pool)
+
+    def close(self):
+        """
+        Stop the worker processes.
+        :return:
+        """
+        self._finalizer()
+
+    def search(self, engine, player1_hex, player2_hex, heuristic, max_depth):
+        """
+        Iterative deepening with the root moves of every depth searched in parallel. The previous best move is searched
+        first, on its own, to set the shared alpha for the rest.
+        :param engine: GameEngine object holding the root position. Search state must be set with 'prepare_search'.
+        :param player1_hex: Set of hexes owned by player 1.
+        :param player2_hex: Set of hexes owned by player 2.
+        :param heuristic: Which evaluation function to use.
+        :param max_depth: Depth limit. Depths 1 to max_depth - 1 are searched.
+        :return:
+        Principal variation of the last completed depth, as a list of cell indices.
+        """
+        player1_hex = list(player1_hex)
+        player2_hex = list(player2_hex)
+        root_player = engine._root_player
+        timer = engine._timer
+        root_moves = engine.orderer.order(engine.board, engine.move_gen.moves(), root_player)
+        pv = []
+        if not root_moves:
+            return pv
+
+        for depth in range(1, max_depth):
+            if pv:
+                root_moves.remove(pv[0])
+                root_moves.insert(0, pv[0])
+            self.shared_alpha.value = float('-inf')
+
+            def _task(move, full_window):
+                return player1_hex, player2_hex, move, depth, heuristic, root_player, timer, full_window
+
+            results = [self.pool.apply(_search_root_move, (_task(root_moves[0], True),))]
+            if results[0][4]:
+                tasks = [_task(move, False) for move in root_moves[1:]]
+                results.extend(self.pool.imap_unordered(_search_root_move, tasks))
+            engine.stats['nodes'] += sum(r[5] for r in results)
+
+            # Fail-low results only bound the score from above and can never be the best move.
+            searched = [r for r in results if r[3] and r[4]]
+            if not searched:
+                break
+            best = max(searched, key=lambda r: r[1])
+            if all(r[4] for r in results):
+                pv = best[2]
+                engine.stats['depth'] = depth
+            else:
+                # Partial depth. The previous best move was fully searched, so the best fully searched move is at
+                # least as good.
+                pv = best[2]
+                break
+            if time() - timer[0] >= timer[1]:
+                break
+        return pv
+
+
+def _init_smp_worker(geometry, shm_name, size_mb):
+    """
+    Lazy SMP worker process initializer. The worker engine gets a transposition table over the shared memory block of
+    the main process instead of its own.
+    :param geometry: Geometry object of the playable cells.
+    :param shm_name: Name of the shared memory block holding the table.
+    :param size_mb: Memory budget the table was created with.
+    :return:
+    """
+    global _worker_engine, _shared_memory
+    from engine.game_engine import GameEngine
+    _worker_engine = GameEngine(None, None, geometry=geometry)
+    # Kept in a global, the block is unmapped when the object is collected.
+    _shared_memory = SharedMemory(name=shm_name)
+    _worker_engine.transposition_table = TranspositionTable(size_mb, buffer=_shared_memory.buf)
+
+
+def _search_smp(task):
+    """
+    Full iterative deepening search in a worker. Only the move ordering differs between workers, the transposition
+    table is shared.
+    :param task: Tuple (player1_hex, player2_hex, heuristic, root_player, timer, max_depth, age, seed).
+    :return:
+    Tuple (principal variation, completed depth, nodes).
+    """
+    global _worker_position
+    player1_hex, player2_hex, heuristic, root_player, timer, max_depth, age, seed = task
+    engine = _worker_engine
+    position = (frozenset(player1_hex), frozenset(player2_hex))
+    if _worker_position != position:
+        engine.set_position(player1_hex, player2_hex)
+        _worker_position = position
+    # The main process clears and ages the shared table. Claim ownership so 'prepare_search' does not clear it again.
+    engine._tt_owner = (root_player, heuristic)
+    engine.prepare_search(heuristic, root_player, timer)
+    engine.transposition_table.age = age
+    engine.orderer.perturb(seed)
+    pv = engine._iterative_deepening(max_depth)
+    return pv, engine.stats['depth'], engine.stats['nodes']
+
+
+class LazySMPSearch:
+    def __init__(self, geometry, size_mb, num_workers=None):
+        """
+        Lazy SMP parallel search. Every worker runs the same iterative deepening search on the whole tree and they
+        cooperate only through a transposition table in shared memory. Workers other than the first perturb their move
+        ordering so they reach different parts of the tree first and fill the table for the others.
+        :param geometry: Geometry object of the playable cells.
+        :param size_mb: Memory budget of the shared transposition table in megabytes.
+        :param num_workers: Number of worker processes. Defaults to the number of CPUs.
+        """
+        self.num_workers = num_workers or multiprocessing.cpu_count()
+        self.shared_memory = SharedMemory(create=True, size=table_bytes(size_mb))
+        # Table of the main process. Cleared and aged here, workers only probe and store.
+        self.transposition_table = TranspositionTable(size_mb, buffer=self.shared_memory.buf)
+        self.transposition_table.clear()
+        self.pool = Pool(self.num_workers, initializer=_init_smp_worker,
+                         initargs=(geometry, self.shared_memory.name, size_mb))
+        self._finalizer = weakref.finalize(self, _release_pool, self.pool, self.shared_memory)
+
+    def close(self):
+        """
+        Stop the worker processes and release the shared memory. Tables built on the shared buffer by the caller must
+        be dropped first.
+        :return:
+        """
+        self._finalizer()
+        # Views on the buffer must go before the block can be closed.
+        self.transposition_table = None
+        self.shared_memory.close()
+
+    def search(self, engine, player1_hex, player2_hex, heuristic, max_depth):
+        """
+        Run the search in every worker and keep the result of the deepest completed iteration. Ties go to the
+        unperturbed worker.
+        :param engine: GameEngine object holding the root position. Its transposition table must be the shared one and
+                       search state must be set with 'prepare_search'.
+        :param player1_hex: Set of hexes owned by player 1.
+        :param player2_hex: Set of hexes owned by player 2.
+        :param heuristic: Which evaluation function to use.
+        :param max_depth: Depth limit. Depths 1 to max_depth - 1 are searched.
+        :return:
+        Principal variation of the deepest completed depth, as a list of cell indices.
+        """
+        player1_hex = list(player1_hex)
+        player2_hex = list(player2_hex)
+        age = engine.transposition_table.age
+        tasks = [(player1_hex, player2_hex, heuristic, engine._root_player, engine._timer, max_depth, age,
+                  None if worker == 0 else worker) for worker in range(self.num_workers)]
+        results = self.pool.map(_search_smp, tasks, chunksize=1)
+        engine.stats['nodes'] += sum(r[2] for r in results)
+
+        pv = []
+        for worker_pv, depth, _ in results:
+            if worker_pv and (not pv or depth > engine.stats['depth']):
+                pv = worker_pv
+                engine.stats['depth'] = depth
+        return pv
@@ -12,6 +12,7 @@ class Player:
             raise TypeError('Wrong player type.')
         if types == 'ai':
             self.heuristic = player_config['heuristic'][int(self.number) - 1]
+            self.search = player_config['search'][int(self.number) - 1]
         self.type = types
 
     def to_dict(self):
@@ -27,6 +28,7 @@ class Player:
         player_dict['move_list'] = self.move_list
         player_dict['hex_list'] = self.hex_list
         player_dict['heuristic'] = None if self.type == 'human' else self.heuristic
+        player_dict['search'] = None if self.type == 'human' else self.search
         player_dict['type'] = self.type
         return player_dict
 
@@ -39,4 +41,6 @@ class Player:
         self.number = player_dict['number']
         self.color = player_dict['color']
         self.heuristic = player_dict['heuristic']
+        # Saves made before MCTS was added have no search entry.
+        self.search = player_dict.get('search', 'alphabeta')
         self.type = player_dict['type']
\ No newline at end of file
@@ -0,0 +1,172 @@
+from time import time
+from engine.board import iter_bits
+from engine.enclosure import check_surrounded, may_enclose
+from engine.geometry import _LENGTH_WIN
+
+# Solver results, from the point of view of the player to move.
+WIN = 1
+UNKNOWN = 0
+LOSS = -1
+
+
+class ThreatSpaceSolver:
+    def __init__(self, engine, max_stones):
+        """
+        Threat space search. The attacker only plays forcing moves: moves that make a four or close in on an enclosure.
+        A forcing move must leave a cell where the attacker wins next turn; the defender then has to take it, so every
+        defender node has a single reply and sequences much deeper than the full width search are proven. Wins are only
+        claimed after checking that the defender has no immediate win of its own anywhere on the board.
+        :param engine: GameEngine object. Moves are made and unmade on its board, so hooks stay in sync.
+        :param max_stones: Number of stones at which the game is a draw.
+        """
+        self.engine = engine
+        self.board = engine.board
+        self.move_gen = engine.move_gen
+        self.threats = engine.threats
+        self.max_stones = max_stones
+        self.nodes = 0
+        self.timed_out = False
+        self._deadline = 0
+
+    def _winning_cells(self, player, cells):
+        """
+        Cells where 'player' wins at once, by a line of five or by surrounding the opponent.
+        :param player: Player identifier (1 or 2).
+        :param cells: Iterable of empty cell indices to try.
+        :return:
+        Set of cell indices.
+        """
+        fives = self.threats.winning_moves(player)
+        wins = set()
+        for idx in cells:
+            if idx in fives:
+                wins.add(idx)
+            elif may_enclose(self.board, idx, player):
+                self.engine._place(idx, player)
+                if check_surrounded(self.board, 3 - player):
+                    wins.add(idx)
+                self.engine._remove(idx)
+        return wins
+
+    def _threat_cells(self, player):
+        """
+        Cells where 'player' would win next turn whatever the opponent plays elsewhere. Only cells that are already
+        next to two stones count, as they stay legal after any reply.
+        :param player: Player identifier (1 or 2).
+        :return:
+        Set of cell indices.
+        """
+        return self._winning_cells(player, iter_bits(self.move_gen.frontier2 & ~self.board.occupied))
+
+    def _forcing_moves(self, player, moves):
+        """
+        Moves that may leave a threat: moves completing an open three into a four first, then moves joining two walls
+        around an enclosure.
+        :param player: Player identifier (1 or 2).
+        :param moves: List of legal cell indices.
+        :return:
+        List of cell indices.
+        """
+        counts = self.threats.counts[player]
+        opposing = self.threats.counts[3 - player]
+        fours = []
+        rings = []
+        for idx in moves:
+            if any(counts[w] == _LENGTH_WIN - 2 and not opposing[w] for w in self.threats.cell_windows[idx]):
+                fours.append(idx)
+            elif may_enclose(self.board, idx, player):
+                rings.append(idx)
+        return fours + rings
+
+    def _out_of_time(self):
+        if not self.timed_out and time() >= self._deadline:
+            self.timed_out = True
+        return self.timed_out
+
+    def _attack(self, attacker, depth):
+        """
+        Attacker node. Looks for a forcing move that wins.
+        :param attacker: Player identifier (1 or 2). Player to move.
+        :param depth: Number of forcing moves left.
+        :return:
+        Winning cell index or None if no win was proven.
+        """
+        if self._out_of_time():
+            return None
+        self.nodes += 1
+        # The defender's last move may have surrounded itself.
+        if self.engine._terminal_score(attacker) is not None:
+            return None
+        moves = self.move_gen.moves()
+        wins = self._winning_cells(attacker, moves)
+        if wins:
+            return min(wins)
+        if depth <= 0 or self.move_gen.num_stones + 1 >= self.max_stones:
+            return None
+        # A defender threat must be answered. Two can't be.
+        defender_threats = self._threat_cells(3 - attacker)
+        if len(defender_threats) > 1:
+            return None
+
+        for move in self._forcing_moves(attacker, moves):
+            if defender_threats and move not in defender_threats:
+                continue
+            self.engine._place(move, attacker)
+            proven = self._defend(attacker, depth - 1)
+            self.engine._remove(move)
+            if proven:
+                return move
+        return None
+
+    def _defend(self, attacker, depth):
+        """
+        Defender node, right after an attacker move.
+        :param attacker: Player identifier (1 or 2) of the attacker. The defender is to move.
+        :param depth: Number of forcing moves left to the attacker.
+        :return:
+        True if the attacker wins against every defence.
+        """
+        if self._out_of_time():
+            return False
+        self.nodes += 1
+        defender = 3 - attacker
+        score = self.engine._terminal_score(defender)
+        if score is not None:
+            # Negative scores are wins of the player that just moved.
+            return score < 0
+        moves = self.move_gen.moves()
+        if self._winning_cells(defender, moves) or self.move_gen.num_stones + 1 >= self.max_stones:
+            return False
+        threats = self._threat_cells(attacker)
+        if not threats:
+            return False
+        replies = [move for move in moves if move in threats]
+        # Only one threat can be taken away per move.
+        if len(threats) > 1 or not replies:
+            return True
+
+        reply = replies[0]
+        self.engine._place(reply, defender)
+        proven = self._attack(attacker, depth) is not None
+        self.engine._remove(reply)
+        return proven
+
+    def solve(self, player, time_limit, max_depth):
+        """
+        Try to prove the current position won or lost for the player to move.
+        :param player: Player to move (1 or 2).
+        :param time_limit: Allowed time in seconds.
+        :param max_depth: Maximum number of forcing moves of the attacker.
+        :return:
+        Tuple (WIN, winning move as a cell index), (LOSS, None) or (UNKNOWN, None).
+        """
+        self._deadline = time() + time_limit
+        self.timed_out = False
+        self.nodes = 0
+        move = self._attack(player, max_depth)
+        if move is not None:
+            return WIN, move
+        # Lost if the opponent already has a threat and wins against every answer.
+        if not self.timed_out and self._defend(3 - player, max_depth):
+            return LOSS, None
+        return UNKNOWN, None
@@ -0,0 +1,127 @@
+from engine.geometry import _LENGTH_WIN
+
+
+class ThreatTable:
+    def __init__(self, board):
+        """
+        Stone counts of every line window of the board (every run of 5 cells along an axis), kept up to date on every
+        move. A window is open for a player while the opponent has no stone in it; an open window with 4 stones is a
+        four (one move from a win) and one with 3 stones a three. Used as a make/unmake hook of the engine.
+        :param board: Board object. The table must be told about every change through 'place' and 'remove'.
+        """
+        self.board = board
+        self.windows = board.geometry.windows.tolist()
+        # Windows every cell belongs to. Up to 5 per axis.
+        self.cell_windows = [[] for _ in range(board.num_cells)]
+        for w, cells in enumerate(self.windows):
+            for idx in cells:
+                self.cell_windows[idx].append(w)
+        self.reset()
+
+    def reset(self):
+        """
+        Full recomputation from the board.
+        :return:
+        """
+        num_windows = len(self.windows)
+        owners = self.board.owners
+        # Indexed by owner (1 or 2) and window. Entry 0 is unused so owner values can be used directly.
+        self.counts = [None] + [[sum(owners[idx] == player for idx in cells) for cells in self.windows]
+                                for player in (1, 2)]
+        # Number of open windows per owner and stone count.
+        self.open = [[0] * (_LENGTH_WIN + 1) for _ in range(3)]
+        # Open windows holding 4 stones, per owner.
+        self.four_windows = [set(), set(), set()]
+        for w in range(num_windows):
+            self._enter(w)
+
+    def _leave(self, w):
+        """
+        Remove a window from the aggregates. Called before its counts change.
+        :param w: Window index.
+        :return:
+        """
+        for player in (1, 2):
+            if not self.counts[3 - player][w]:
+                stones = self.counts[player][w]
+                self.open[player][stones] -= 1
+                if stones == _LENGTH_WIN - 1:
+                    self.four_windows[player].discard(w)
+
+    def _enter(self, w):
+        """
+        Add a window to the aggregates. Called after its counts change.
+        :param w: Window index.
+        :return:
+        """
+        for player in (1, 2):
+            if not self.counts[3 - player][w]:
+                stones = self.counts[player][w]
+                self.open[player][stones] += 1
+                if stones == _LENGTH_WIN - 1:
+                    self.four_windows[player].add(w)
+
+    def place(self, idx, player):
+        """
+        Called after a stone is placed.
+        :param idx: Cell index.
+        :param player: Player identifier (1 or 2).
+        :return:
+        """
+        counts = self.counts[player]
+        for w in self.cell_windows[idx]:
+            self._leave(w)
+            counts[w] += 1
+            self._enter(w)
+
+    def remove(self, idx, player):
+        """
+        Called before a stone is removed.
+        :param idx: Cell index.
+        :param player: Owner of the stone (1 or 2).
+        :return:
+        """
+        counts = self.counts[player]
+        for w in self.cell_windows[idx]:
+            self._leave(w)
+            counts[w] -= 1
+            self._enter(w)
+
+    def fours(self, player):
+        """
+        :param player: Player identifier (1 or 2).
+        :return:
+        Number of open windows with 4 stones of 'player'.
+        """
+        return self.open[player][_LENGTH_WIN - 1]
+
+    def threes(self, player):
+        """
+        :param player: Player identifier (1 or 2).
+        :return:
+        Number of open windows with 3 stones of 'player'.
+        """
+        return self.open[player][_LENGTH_WIN - 2]
+
+    def has_five(self, player):
+        """
+        :param player: Player identifier (1 or 2).
+        :return:
+        True if 'player' has 5 stones in a line.
+        """
+        return self.open[player][_LENGTH_WIN] > 0
+
+    def winning_moves(self, player):
+        """
+        Cells that complete a line of 5 for 'player'. Whether they are legal moves is not checked.
+        :param player: Player identifier (1 or 2).
+        :return:
+        Set of cell indices.
+        """
+        owners = self.board.owners
+        moves = set()
+        for w in self.four_windows[player]:
+            for idx in self.windows[w]:
+                if owners[idx] == -1:
+                    moves.add(idx)
+        return moves
@@ -0,0 +1,151 @@
+import struct
+import numpy as np
+
+# Bound flags. 0 marks an empty slot.
+EXACT = 1
+LOWER = 2
+UPPER = 3
+
+# Packed entry layout (64 bits): value as float32 bits | depth | flag | move + 1 | search age.
+_DEPTH_SHIFT = 32
+_FLAG_SHIFT = 40
+_MOVE_SHIFT = 42
+_AGE_SHIFT = 52
+_MASK_8 = 0xFF
+_MASK_2 = 0x3
+_MASK_10 = 0x3FF
+_MASK_6 = 0x3F
+_MASK_32 = 0xFFFFFFFF
+# Two slots per bucket, 8 bytes for the key and 8 for the data each.
+_BUCKET_BYTES = 2 * 2 * 8
+
+
+def _pack(value, depth, flag, move, age):
+    """
+    Pack an entry into a single 64 bits integer.
+    :param value: Search score.
+    :param depth: Remaining depth the score was searched to.
+    :param flag: EXACT, LOWER or UPPER.
+    :param move: Best move as a cell index or None.
+    :param age: Search counter the entry belongs to.
+    :return:
+    Integer.
+    """
+    value_bits = struct.unpack('<I', struct.pack('<f', value))[0]
+    move = 0 if move is None else move + 1
+    return (value_bits
+            | (min(max(depth, 0), _MASK_8) << _DEPTH_SHIFT)
+            | (flag << _FLAG_SHIFT)
+            | (move << _MOVE_SHIFT)
+            | ((age & _MASK_6) << _AGE_SHIFT))
+
+
+def _unpack(data):
+    """
+    Inverse of '_pack'.
+    :param data: Integer.
+    :return:
+    Tuple (value, depth, flag, move). Move is None if no move was stored.
+    """
+    value = struct.unpack('<f', struct.pack('<I', data & _MASK_32))[0]
+    depth = (data >> _DEPTH_SHIFT) & _MASK_8
+    flag = (data >> _FLAG_SHIFT) & _MASK_2
+    move = ((data >> _MOVE_SHIFT) & _MASK_10) - 1
+    return value, depth, flag, None if move < 0 else move
+
+
+def table_bytes(size_mb):
+    """
+    Bytes actually used by a table built with a given memory budget.
+    :param size_mb: Memory budget in megabytes.
+    :return:
+    Integer.
+    """
+    num_buckets = max(1, int(size_mb * 2 ** 20) // _BUCKET_BYTES)
+    # Round down to a power of two so the bucket is found with a mask.
+    return (1 << (num_buckets.bit_length() - 1)) * _BUCKET_BYTES
+
+
+class TranspositionTable:
+    def __init__(self, size_mb=64, buffer=None):
+        """
+        Fixed size transposition table preallocated as NumPy arrays. Every bucket has a depth-preferred slot and an
+        always-replace slot. Keys are stored XORed with their data so a torn or foreign entry fails the key check.
+        That makes the table safe to share between processes without locks.
+        :param size_mb: Memory budget in megabytes.
+        :param buffer: Optional buffer of at least 'table_bytes(size_mb)' bytes to hold the entries, e.g. the buffer of
+                       a multiprocessing.shared_memory.SharedMemory. Its content is used as is.
+        """
+        self.num_buckets = table_bytes(size_mb) // _BUCKET_BYTES
+        self._mask = self.num_buckets - 1
+        if buffer is None:
+            self.keys = np.zeros((self.num_buckets, 2), dtype=np.uint64)
+            self.data = np.zeros((self.num_buckets, 2), dtype=np.uint64)
+        else:
+            entries = np.ndarray((2, self.num_buckets, 2), dtype=np.uint64, buffer=buffer)
+            self.keys = entries[0]
+            self.data = entries[1]
+        self.age = 0
+        self.hits = 0
+        self.stores = 0
+
+    def __len__(self):
+        return int(np.count_nonzero(self.data))
+
+    def new_search(self):
+        """
+        Start a new search. Entries from previous searches lose their claim to the depth-preferred slots.
+        :return:
+        """
+        self.age = (self.age + 1) & _MASK_6
+
+    def clear(self):
+        """
+        Remove every entry.
+        :return:
+        """
+        self.keys.fill(0)
+        self.data.fill(0)
+
+    def probe(self, key):
+        """
+        Look for a position in the table.
+        :param key: 64 bits Zobrist key.
+        :return:
+        Tuple (value, depth, flag, move) or None if the position is not stored.
+        """
+        bucket = key & self._mask
+        for slot in (0, 1):
+            data = int(self.data[bucket, slot])
+            if data and int(self.keys[bucket, slot]) ^ data == key:
+                self.hits += 1
+                return _unpack(data)
+        return None
+
+    def store(self, key, depth, value, flag, move=None):
+        """
+        Store a search result. The depth-preferred slot is replaced by deeper (or equally deep) results, results of a
+        new search and results for the same position. Everything else goes to the always-replace slot.
+        :param key: 64 bits Zobrist key.
+        :param depth: Remaining depth the score was searched to.
+        :param value: Search score.
+        :param flag: EXACT, LOWER or UPPER.
+        :param move: Best move as a cell index or None.
+        :return:
+        """
+        bucket = key & self._mask
+        data = _pack(value, depth, flag, move, self.age)
+        old = int(self.data[bucket, 0])
+        same_key = old and int(self.keys[bucket, 0]) ^ old == key
+        if (not old or same_key or depth >= (old >> _DEPTH_SHIFT) & _MASK_8
+                or (old >> _AGE_SHIFT) & _MASK_6 != self.age):
+            slot = 0
+            if old and not same_key:
+                # Demote the previous entry instead of dropping it.
+                self.keys[bucket, 1] = self.keys[bucket, 0]
+                self.data[bucket, 1] = old
+        else:
+            slot = 1
+        self.keys[bucket, slot] = key ^ data
+        self.data[bucket, slot] = data
+        self.stores += 1
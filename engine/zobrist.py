@@ -1,25 +1,114 @@
 import random
+from engine.board import iter_bits, popcount
+
+# Fixed seed. Every engine built on the same board gets the same keys, so keys can be shared between processes.
+_SEED = 20200126
 
 
 class ZobristHash:
-    def __init__(self, graph):
+    def __init__(self, board, seed=_SEED):
         self.num_pieces = 2
-        self.num_spaces = len(graph.nodes)
-        self.table = dict()
+        self.num_spaces = board.num_cells
+        # Indexed by owner and then cell index. Entry 0 is unused so owner values can be used directly.
+        self.table = [[0] * self.num_spaces]
+        rng = random.Random(seed)
 
         # Compute a number of random 64 bits keys based on the number of board positions and type of player pieces
-        nodes = [*graph.nodes]
         for i in range(self.num_pieces):
-            for node in nodes:
-                self.table[i+1, node] = random.getrandbits(64)
+            self.table.append([rng.getrandbits(64) for _ in range(self.num_spaces)])
+        # Key XORed in while the second player is to move.
+        self.side = rng.getrandbits(64)
+        # Running key of the current position. Kept up to date through 'update'.
+        self.key = 0
+        # Cell permutations of the board symmetries and their inverses. Row 0 is the identity.
+        self.symmetries = board.geometry.symmetries.tolist()
+        self.inverses = [[0] * self.num_spaces for _ in self.symmetries]
+        for inverse, perm in zip(self.inverses, self.symmetries):
+            for idx, image in enumerate(perm):
+                inverse[image] = idx
+        # Running keys of the position seen through every symmetry. Entry 0 is always equal to 'key'.
+        self.keys = [0] * len(self.symmetries)
+        # Per owner and cell, what a stone changes in each of the running keys. Side flip included.
+        self.sym_table = [None] + [[[table[perm[idx]] ^ self.side for perm in self.symmetries]
+                                    for idx in range(self.num_spaces)] for table in self.table[1:]]
+
+    def update(self, owner, idx):
+        """
+        Incremental update. Toggles a stone of 'owner' on cell 'idx' and flips the side to move. The same call is
+        used for placing and removing the stone.
+        :param owner: Player identifier (1 or 2).
+        :param idx: Cell index.
+        :return:
+        The new running key.
+        """
+        self.key ^= self.table[owner][idx] ^ self.side
+        self.keys = [key ^ delta for key, delta in zip(self.keys, self.sym_table[owner][idx])]
+        return self.key
+
+    def reset(self, board):
+        """
+        Set every running key from a full computation.
+        :param board: Board object.
+        :return:
+        """
+        self.keys = [self._transformed(board, perm) for perm in self.symmetries]
+        self.key = self.keys[0]
 
-    def hash(self, graph):
+    def canonical_key(self):
+        """
+        Canonical key of the current position from the running keys. Same result as 'canonical' without walking the
+        board.
+        :return:
+        Tuple (64 bits key, symmetry index).
+        """
+        key = min(self.keys)
+        return key, self.keys.index(key)
+
+    def hash(self, board):
+        """
+        Full computation of the key of a position. Used to (re)initialize the running key.
+        :param board: Board object.
+        :return:
+        64 bits key.
+        """
         h = 0
-        nodes = [*graph.nodes]
-        for node in nodes:
-            owner = graph.nodes[node]['owner']
-            # Check if a stone is occupying a cell.
-            if not owner == -1:
-                # If it is XOR the current has key value with that of the corresponding position.
-                h = h ^ self.table[(owner, node)]
-        return h
\ No newline at end of file
+        for owner in range(1, self.num_pieces + 1):
+            table = self.table[owner]
+            # Only cells occupying a stone contribute. XOR the current hash key value with that of the position.
+            for idx in iter_bits(board.bits[owner]):
+                h = h ^ table[idx]
+        # Player 1 always starts, so an odd stone count means the second player is to move.
+        if popcount(board.occupied) % 2:
+            h = h ^ self.side
+        return h
+
+    def canonical(self, board):
+        """
+        Key shared by every position equal up to a symmetry of the board: the smallest key among the transformed
+        positions.
+        :param board: Board object.
+        :return:
+        Tuple (64 bits key, symmetry index). Moves map to the canonical frame through 'symmetries[index]' and back
+        through 'inverses[index]'.
+        """
+        best = None
+        for sym, perm in enumerate(self.symmetries):
+            h = self._transformed(board, perm)
+            if best is None or h < best[0]:
+                best = (h, sym)
+        return best
+
+    def _transformed(self, board, perm):
+        """
+        Full computation of the key of a position moved by a symmetry.
+        :param board: Board object.
+        :param perm: Cell permutation of the symmetry.
+        :return:
+        64 bits key.
+        """
+        h = self.side if popcount(board.occupied) % 2 else 0
+        for owner in range(1, self.num_pieces + 1):
+            table = self.table[owner]
+            for idx in iter_bits(board.bits[owner]):
+                h ^= table[perm[idx]]
+        return h
@@ -1,5 +1,6 @@
 import pygame
 from gui.hex.map import Map
+from engine.geometry import board_geometry
 from gui.hex.render import RenderGrid, RenderFog, RenderUnits
 
 
@@ -72,7 +73,7 @@ class GameWindow:
         """
         Given a cell position change its color.
         :param cell: Tuple (x, y)
-        :param color: PyGame color of a player
+        :param color: RGBA tuple or PyGame color of a player
         :return:
         """
         self.map.fog[cell] = color
@@ -93,17 +94,8 @@ class GameWindow:
             for cell in list(self.map.cells()):
                 self.map.fog[cell] = self.fog.OBSCURED
             # Turn 'on' the necessary hexes
-            for i in range(7, 7 + self.board_size):
-                for cell in list(self.map.line((i, 0), direction=0, length=self.board_size-1)):
-                    self.map.fog[cell] = self.fog.VISIBLE
-                for cell in list(self.map.line((i, 0), direction=1, length=self.board_size-1)):
-                    self.map.fog[cell] = self.fog.VISIBLE
-                for cell in list(self.map.line((i + self.board_size-1,
-                                                (self.board_size-1)*2), direction=4, length=self.board_size-1)):
-                    self.map.fog[cell] = self.fog.VISIBLE
-                for cell in list(self.map.line((i + self.board_size-1,
-                                                (self.board_size-1)*2), direction=3, length=self.board_size-1)):
-                    self.map.fog[cell] = self.fog.VISIBLE
+            for cell in board_geometry(self.board_size).cells.tolist():
+                self.map.fog[tuple(cell)] = self.fog.VISIBLE
         self.grid.draw()
         self.fog.draw()
         self.window.blit(self.grid, (0, 0))
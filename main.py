@@ -1,5 +1,10 @@
+import argparse
 from engine.game_instance import GameInstance
 
 if __name__ == '__main__':
-    game = GameInstance()
+    parser = argparse.ArgumentParser(description='Play a game of Andantino.')
+    parser.add_argument('--headless', action='store_true',
+                        help='Play ai vs. ai without a window or pygame, whatever the configured player types.')
+    args = parser.parse_args()
+    game = GameInstance(headless=args.headless)
     game.run()